@@ -1,6 +1,7 @@
 from sqlalchemy import Column
 from sqlalchemy import Table
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import DeclarativeBase
 from pyquaternion import Quaternion
@@ -37,13 +38,52 @@ class Position:
     def qwxyz(self):
         return [self.qw, self.qx, self.qy, self.qz]
 
+    def _memoized(self, name: str, key: tuple, compute):
+        """
+        Derived values are cached on the instance together with the columns they were computed from,
+        they are recomputed once any of these columns changes.
+        :param name: Name of the cached value.
+        :param key: Current values of the columns the value is derived from.
+        :param compute: Computes the value if it is not cached or outdated.
+        :return: The cached value.
+        """
+        cache = self.__dict__.setdefault("_geometry_cache", {})
+        cached = cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = compute()
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        cache[name] = (key, value)
+        return value
+
     @property
     def q(self):
-        return Quaternion(self.qwxyz)
+        return self._memoized("q", tuple(self.qwxyz), lambda: Quaternion(self.qwxyz))
+
+    @property
+    def q_inverse(self):
+        return self._memoized("q_inverse", tuple(self.qwxyz), lambda: self.q.inverse)
+
+    @property
+    def rotation_matrix(self):
+        return self._memoized(
+            "rotation_matrix", tuple(self.qwxyz), lambda: self.q.rotation_matrix
+        )
+
+    @property
+    def inverse_rotation_matrix(self):
+        return self._memoized(
+            "inverse_rotation_matrix",
+            tuple(self.qwxyz),
+            lambda: self.q_inverse.rotation_matrix,
+        )
 
     @property
     def yaw(self):
-        return self.quaternion_yaw(self.q)
+        return self._memoized(
+            "yaw", tuple(self.qwxyz), lambda: self.quaternion_yaw(self.q)
+        )
 
     def quaternion_yaw(self, q: Quaternion) -> float:
         """
@@ -76,6 +116,8 @@ ego_map_association_table = Table(
     Base.metadata,
     Column("ego_id", ForeignKey("ego.id"), primary_key=True),
     Column("map_id", ForeignKey("map.id"), primary_key=True),
+    # the composite primary keys only serve lookups by their first column
+    Index("ix_ego_map_association_table_map_id", "map_id"),
 )
 
 agent_map = Table(
@@ -83,6 +125,7 @@ agent_map = Table(
     Base.metadata,
     Column("agent_id", ForeignKey("agent.id"), primary_key=True),
     Column("map_id", ForeignKey("map.id"), primary_key=True),
+    Index("ix_agent_map_map_id", "map_id"),
 )
 
 frame_maneuver = Table(
@@ -90,6 +133,7 @@ frame_maneuver = Table(
     Base.metadata,
     Column("frame_id", ForeignKey("frame.id"), primary_key=True),
     Column("maneuver", ForeignKey("maneuver.id"), primary_key=True),
+    Index("ix_frame_maneuver_maneuver", "maneuver"),
 )
 
 agent_maneuver = Table(
@@ -97,4 +141,5 @@ agent_maneuver = Table(
     Base.metadata,
     Column("agent_id", ForeignKey("agent.id"), primary_key=True),
     Column("maneuver", ForeignKey("maneuver.id"), primary_key=True),
+    Index("ix_agent_maneuver_maneuver", "maneuver"),
 )
@@ -0,0 +1,57 @@
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from . import utils as adu
+from .models import Agent, AgentGeometry, Frame
+
+
+def compute_agent_geometry(session: Session, chunk_size: int = 10000):
+    """
+    Store the lidar-frame poses and 2D boxes of all agents without a stored geometry, e.g. newly ingested ones.
+    The agents are projected in chunks, each chunk is written with a single executemany INSERT.
+    :param session: Session of the database.
+    :param chunk_size: Number of agents loaded at once.
+    """
+    agent_ids = session.scalars(
+        select(Agent.id).where(~Agent.geometry.has()).order_by(Agent.id)
+    ).all()
+
+    for start in range(0, len(agent_ids), chunk_size):
+        chunk = agent_ids[start : start + chunk_size]
+        agents = session.scalars(
+            select(Agent)
+            .where(Agent.id.between(chunk[0], chunk[-1]), ~Agent.geometry.has())
+            .options(
+                joinedload(Agent.frame).options(
+                    selectinload(Frame.sensor_map), selectinload(Frame.ego)
+                )
+            )
+        ).all()
+
+        xyz, q = adu.get_lidar_poses(agents)
+        bboxes, cameras = adu.get_bbox_2d(agents)
+        session.execute(
+            insert(AgentGeometry),
+            [
+                dict(
+                    agent_id=a.id,
+                    x=p[0],
+                    y=p[1],
+                    z=p[2],
+                    qw=r[0],
+                    qx=r[1],
+                    qy=r[2],
+                    qz=r[3],
+                    camera=camera,
+                    min_x=None if camera is None else b[0],
+                    min_y=None if camera is None else b[1],
+                    max_x=None if camera is None else b[2],
+                    max_y=None if camera is None else b[3],
+                )
+                for a, p, r, b, camera in zip(
+                    agents, xyz.tolist(), q.tolist(), bboxes.tolist(), cameras
+                )
+            ],
+        )
+        session.commit()
+        session.expunge_all()
@@ -0,0 +1,41 @@
+"""
+Eager-loading option bundles for the common access paths, e.g.
+`select(Maneuver).options(*VQA_EXTRACTION)`.
+Each bundle loads the relationships its stage touches with a constant number of
+SELECTs per statement instead of lazy loading them object by object.
+"""
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import Agent, Frame, Track
+from .maneuvers import Maneuver
+
+# maneuvers with their frames, ego poses and the agents of their track
+DOWNSAMPLING = (
+    selectinload(Maneuver.pos_maneuvers),
+    selectinload(Maneuver.neg_maneuvers),
+    selectinload(Maneuver.other_agents),
+    selectinload(Maneuver.track).selectinload(Track.agents),
+    selectinload(Maneuver.frames).selectinload(Frame.ego),
+)
+
+# additionally the sensors, scenes and stored agent geometry used for camera paths,
+# lidar poses and 2D boxes
+VQA_EXTRACTION = DOWNSAMPLING + (
+    selectinload(Maneuver.frames).options(
+        selectinload(Frame.sensor_map),
+        joinedload(Frame.scene),
+    ),
+    selectinload(Maneuver.track)
+    .selectinload(Track.agents)
+    .selectinload(Agent.geometry),
+    selectinload(Maneuver.other_agents).selectinload(Agent.geometry),
+)
+
+VERIFICATION = VQA_EXTRACTION
+
+# maneuvers with what is needed to group the predictions, as used by `evaluate`
+EVALUATION = (
+    selectinload(Maneuver.pos_maneuvers),
+    selectinload(Maneuver.other_agents),
+)
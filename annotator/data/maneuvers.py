@@ -1,7 +1,7 @@
 import enum
 from typing import List, Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import TypeDecorator, String
 from sqlalchemy.ext.mutable import MutableList
@@ -12,6 +12,7 @@ from . import (
     frame_maneuver,
     agent_maneuver,
 )
+from . import utils as adu
 
 
 class ManeuverType(enum.IntEnum):
@@ -102,7 +103,9 @@ class NegativeManeuver(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     type: Mapped[ManeuverType]
 
-    maneuver_id: Mapped[Optional[int]] = mapped_column(ForeignKey("maneuver.id"))
+    maneuver_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("maneuver.id"), index=True
+    )
     maneuver: Mapped[Optional["Maneuver"]] = relationship(
         back_populates="neg_maneuvers"
     )
@@ -119,10 +122,16 @@ class NegativeManeuver(Base):
 
 class PositiveManeuver(Base):
     __tablename__ = "positive_maneuver"
+    # maneuvers of a type, as selected by the downsampling and verification
+    __table_args__ = (
+        Index("ix_positive_maneuver_type_maneuver_id", "type", "maneuver_id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     type: Mapped[ManeuverType]
 
-    maneuver_id: Mapped[Optional[int]] = mapped_column(ForeignKey("maneuver.id"))
+    maneuver_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("maneuver.id"), index=True
+    )
     maneuver: Mapped[Optional["Maneuver"]] = relationship(
         back_populates="pos_maneuvers"
     )
@@ -139,6 +148,9 @@ class PositiveManeuver(Base):
 
 class Maneuver(Base):
     __tablename__ = "maneuver"
+    __table_args__ = (
+        Index("ix_maneuver_in_use_manually_labeled", "in_use", "manually_labeled"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     manually_labeled: Mapped[bool]
     in_use: Mapped[bool]
@@ -161,6 +173,8 @@ class Maneuver(Base):
     )
 
     instance_token: Mapped[Optional[str]]
+    track_id: Mapped[Optional[int]] = mapped_column(ForeignKey("track.id"), index=True)
+    track: Mapped[Optional["Track"]] = relationship()
     frames: Mapped[List["Frame"]] = relationship(
         secondary=frame_maneuver,
         back_populates="maneuvers",
@@ -177,12 +191,10 @@ class Maneuver(Base):
 
     @property
     def agents(self):
-        agents = []
-        for frame in self.frames:
-            for agent in frame.agents:
-                if agent.track.instance_token == self.instance_token:
-                    agents.append(agent)
-        return agents
+        if self.track is None:
+            return []
+        frame_agents = {a.frame_id: a for a in self.track.agents}
+        return [frame_agents[f.id] for f in self.frames if f.id in frame_agents]
 
     @property
     def egos(self):
@@ -228,17 +240,15 @@ class Maneuver(Base):
 
     def get_xys_in_ego(self):
         assert self.is_agent, "It has to be agent's maneuver"
-        xys = []
-        for a, f in zip(self.agents, self.frames):
-            xys.append(a.translate_rotate_xyz(-np.array(f.ego.xyz), f.ego.q.inverse))
-        return np.array(xys)
+        agents = self.agents
+        egos = [f.ego for _, f in zip(agents, self.frames)]
+        return adu.get_xyz_in_other(agents[: len(egos)], egos)
 
     def get_other_xys_in_ego(self):
         assert self.is_other_agent, "It has to be two agent maneuver"
-        xys = []
-        for a, f in zip(self.other_agents, self.frames):
-            xys.append(a.translate_rotate_xyz(-np.array(f.ego.xyz), f.ego.q.inverse))
-        return np.array(xys)
+        other_agents = self.other_agents
+        egos = [f.ego for _, f in zip(other_agents, self.frames)]
+        return adu.get_xyz_in_other(other_agents[: len(egos)], egos)
 
     def get_visibilities(self):
         assert self.is_agent, "It has to be agent's maneuver"
@@ -0,0 +1,86 @@
+from sqlalchemy import inspect, text
+
+from . import Base
+from . import maneuvers  # noqa: F401, registers the maneuver tables
+
+
+# track of a maneuver's agent, found through its instance token and frames
+MANEUVER_TRACK = """
+    SELECT agent.track_id
+    FROM frame_maneuver
+    JOIN agent ON agent.frame_id = frame_maneuver.frame_id
+    JOIN track ON track.id = agent.track_id
+    WHERE frame_maneuver.maneuver = maneuver.id
+    AND track.instance_token = maneuver.instance_token
+    LIMIT 1
+"""
+
+
+def add_maneuver_track(connection):
+    """
+    Store the track of agent maneuvers, found through their instance token and frames.
+    Agent maneuvers without a track, e.g. written by an older miner, are backfilled as well.
+    Nothing is written to an up-to-date database, so it can be opened read-only.
+    """
+    columns = [c["name"] for c in inspect(connection).get_columns("maneuver")]
+    if "track_id" not in columns:
+        connection.execute(
+            text(
+                "ALTER TABLE maneuver ADD COLUMN track_id INTEGER REFERENCES track (id)"
+            )
+        )
+    else:
+        missing = connection.execute(
+            text(
+                f"""
+                SELECT 1 FROM maneuver
+                WHERE instance_token IS NOT NULL AND track_id IS NULL
+                AND ({MANEUVER_TRACK}) IS NOT NULL
+                LIMIT 1
+                """
+            )
+        ).first()
+        if missing is None:
+            return
+
+    connection.execute(
+        text(
+            f"""
+            UPDATE maneuver SET track_id = ({MANEUVER_TRACK})
+            WHERE instance_token IS NOT NULL AND track_id IS NULL
+            """
+        )
+    )
+
+
+def add_indexes(connection):
+    """
+    Create the indexes declared on the models that are missing in the existing tables, and
+    refresh the planner statistics of SQLite once any was created.
+    """
+    created = False
+    for table in Base.metadata.sorted_tables:
+        existing = {i["name"] for i in inspect(connection).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+                created = True
+    if created:
+        connection.execute(text("ANALYZE"))
+
+
+MIGRATIONS = [
+    add_maneuver_track,
+    add_indexes,
+]
+
+
+def migrate(engine):
+    """
+    Create missing tables and bring the existing ones up to date with the models.
+    Only writes when something is missing, an up-to-date database is left untouched.
+    """
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        for migration in MIGRATIONS:
+            migration(connection)
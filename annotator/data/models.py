@@ -1,11 +1,11 @@
 import enum
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 from sqlalchemy.orm import relationship
-from shapely.geometry import MultiPoint, box
+from sqlalchemy.orm import attribute_keyed_dict
 
 import numpy as np
 
@@ -39,7 +39,7 @@ class SensorType(enum.Enum):
 class Map(Base):
     __tablename__ = "map"
     id: Mapped[int] = mapped_column(primary_key=True)
-    token: Mapped[str]
+    token: Mapped[str] = mapped_column(unique=True, index=True)
     lane_type: Mapped[LaneType]
 
     egos: Mapped[List["Ego"]] = relationship(
@@ -60,7 +60,7 @@ class Ego(Base, Position):
     ego_pose_token: Mapped[str]
     velocity: Mapped[float | None]
 
-    frame_id: Mapped[int] = mapped_column(ForeignKey("frame.id"))
+    frame_id: Mapped[int] = mapped_column(ForeignKey("frame.id"), index=True)
     frame: Mapped["Frame"] = relationship(back_populates="ego")
 
     maps: Mapped[List[Map]] = relationship(
@@ -118,6 +118,8 @@ class Agent(Base, Position):
     }
 
     __tablename__ = "agent"
+    # the agents of a track in frame order, also serves lookups by track alone
+    __table_args__ = (Index("ix_agent_track_id_frame_id", "track_id", "frame_id"),)
     id: Mapped[int] = mapped_column(primary_key=True)
     sample_token: Mapped[str]
     category_name: Mapped[str]
@@ -132,7 +134,7 @@ class Agent(Base, Position):
     track_id: Mapped[int] = mapped_column(ForeignKey("track.id"))
     track: Mapped["Track"] = relationship(back_populates="agents")
 
-    frame_id: Mapped[int] = mapped_column(ForeignKey("frame.id"))
+    frame_id: Mapped[int] = mapped_column(ForeignKey("frame.id"), index=True)
     frame: Mapped["Frame"] = relationship(back_populates="agents")
 
     maps: Mapped[List[Map]] = relationship(secondary=agent_map, back_populates="agents")
@@ -141,16 +143,22 @@ class Agent(Base, Position):
         secondary=agent_maneuver, back_populates="other_agents"
     )
 
+    geometry: Mapped[Optional["AgentGeometry"]] = relationship(back_populates="agent")
+
     def __repr__(self) -> str:
         return f"Agent(sample_token={self.sample_token!r}, category_name={self.category_name!r}, x={self.x!r}, y={self.y!r}, z={self.z!r})"
 
     @property
     def velocity(self):
-        return np.linalg.norm([self.vx, self.vy, self.vz])
+        return self._memoized(
+            "velocity",
+            (self.vx, self.vy, self.vz),
+            lambda: np.linalg.norm([self.vx, self.vy, self.vz]),
+        )
 
     @property
     def velocity_kmh(self):
-        return np.linalg.norm([self.vx, self.vy, self.vz]) * 3.6
+        return self.velocity * 3.6
 
     @property
     def lwh(self):
@@ -211,6 +219,9 @@ class Agent(Base, Position):
             raise ValueError(f"Unknown nuScenes visibility type {nuscenes_visibility}")
 
     def get_position_in_lidar_frame(self) -> Position:
+        if self.geometry is not None:
+            return self.geometry
+
         lidar_sensor = self.frame.get_sensor(SensorType.LIDAR_TOP)
 
         xyz = self.xyz
@@ -218,13 +229,13 @@ class Agent(Base, Position):
 
         # global -> ego
         xyz = np.array(xyz) - np.array(self.frame.ego.xyz)
-        xyz = np.dot(self.frame.ego.q.inverse.rotation_matrix, xyz)
-        q = self.frame.ego.q.inverse * q
+        xyz = np.dot(self.frame.ego.inverse_rotation_matrix, xyz)
+        q = self.frame.ego.q_inverse * q
 
         # ego -> sensor
         xyz = xyz - np.array(lidar_sensor.xyz)
-        xyz = np.dot(lidar_sensor.q.inverse.rotation_matrix, xyz)
-        q = lidar_sensor.q.inverse * q
+        xyz = np.dot(lidar_sensor.inverse_rotation_matrix, xyz)
+        q = lidar_sensor.q_inverse * q
 
         p = Position()
         p.x = xyz[0]
@@ -238,93 +249,17 @@ class Agent(Base, Position):
         return p
 
     def get_bbox_2d(self) -> Tuple[Tuple[float, float, float, float], SensorType]:
-        for sensor_type in [
-            SensorType.CAM_FRONT,
-            SensorType.CAM_FRONT_RIGHT,
-            SensorType.CAM_BACK_RIGHT,
-            SensorType.CAM_BACK,
-            SensorType.CAM_BACK_LEFT,
-            SensorType.CAM_FRONT_LEFT,
-        ]:
-            sensor = self.frame.get_sensor(sensor_type)
-
-            xyz = self.xyz
-            q = self.q
-
-            # global -> ego
-            xyz = np.array(xyz) - np.array(self.frame.ego.xyz)
-            xyz = np.dot(self.frame.ego.q.inverse.rotation_matrix, xyz)
-            q = self.frame.ego.q.inverse * q
-
-            # ego -> sensor
-            xyz = xyz - np.array(sensor.xyz)
-            xyz = np.dot(sensor.q.inverse.rotation_matrix, xyz)
-            q = sensor.q.inverse * q
-
-            # get corners
-            w, l, h = self.width, self.length, self.height
-            # 3D bounding box corners. (Convention: x points forward, y to the left, z up.)
-            x_corners = l / 2 * np.array([1, 1, 1, 1, -1, -1, -1, -1])
-            y_corners = w / 2 * np.array([1, -1, -1, 1, 1, -1, -1, 1])
-            z_corners = h / 2 * np.array([1, 1, -1, -1, 1, 1, -1, -1])
-            corners = np.vstack((x_corners, y_corners, z_corners))
-            # rotate
-            corners = np.dot(q.rotation_matrix, corners)
-            # translate
-            x, y, z = xyz
-            corners[0, :] = corners[0, :] + x
-            corners[1, :] = corners[1, :] + y
-            corners[2, :] = corners[2, :] + z
-            # Filter out the corners that are not in front of the calibrated sensor.
-            in_front = np.argwhere(corners[2, :] > 0).flatten()
-            corners = corners[:, in_front]
-
-            # project to image plane
-            viewpad = np.eye(4)
-            viewpad[
-                : sensor.camera_matrix.shape[0], : sensor.camera_matrix.shape[1]
-            ] = sensor.camera_matrix
-            nbr_points = corners.shape[1]
-            # do operation in homogenous coordinates.
-            points = np.concatenate((corners, np.ones((1, nbr_points))))
-            points = np.dot(viewpad, points)
-            points = points[:3, :]
-            # normalize
-            points = points / points[2:3, :].repeat(3, 0).reshape(3, nbr_points)
-            points = points.T[:, :2].tolist()
-
-            bbox_2d = self._post_process_coords(points)
-            if bbox_2d is not None:
-                return bbox_2d, sensor_type
-        assert False, "Object has to be visible in one camera frame."
-
-    def _post_process_coords(
-        self, corner_coords: List, imsize: Tuple[int, int] = (1600, 900)
-    ) -> Union[Tuple[float, float, float, float], None]:
-        """
-        Get the intersection of the convex hull of the reprojected bbox corners and the image canvas, return None if no
-        intersection.
-        :param corner_coords: Corner coordinates of reprojected bounding box.
-        :param imsize: Size of the image canvas.
-        :return: Intersection of the convex hull of the 2D box corners and the image canvas.
-        """
-        polygon_from_2d_box = MultiPoint(corner_coords).convex_hull
-        img_canvas = box(0, 0, imsize[0], imsize[1])
-
-        if polygon_from_2d_box.intersects(img_canvas):
-            img_intersection = polygon_from_2d_box.intersection(img_canvas)
-            intersection_coords = np.array([
-                coord for coord in img_intersection.exterior.coords
-            ])
-
-            min_x = min(intersection_coords[:, 0])
-            min_y = min(intersection_coords[:, 1])
-            max_x = max(intersection_coords[:, 0])
-            max_y = max(intersection_coords[:, 1])
-
-            return min_x, min_y, max_x, max_y
-        else:
-            return None
+        if self.geometry is not None:
+            assert self.geometry.camera is not None, (
+                "Object has to be visible in one camera frame."
+            )
+            return self.geometry.bbox_2d, self.geometry.camera
+
+        from .utils import get_bbox_2d
+
+        bboxes, cameras = get_bbox_2d([self])
+        assert cameras[0] is not None, "Object has to be visible in one camera frame."
+        return tuple(bboxes[0]), cameras[0]
 
     def _visualize(self):
         bbox, sensor = self.get_bbox_2d()
@@ -364,35 +299,49 @@ class Agent(Base, Position):
         o3d.visualization.draw_geometries([o3d_pcl, origin, bb_3d])
 
 
+class AgentGeometry(Base, Position):
+    """
+    Geometry derived from an agent, its ego pose and the sensor calibration, stored once after the extraction.
+    The position is the pose in the frame of the top lidar, the 2D box is in the first camera the agent is
+    visible in, both are None if there is none.
+    """
+
+    __tablename__ = "agent_geometry"
+    agent_id: Mapped[int] = mapped_column(ForeignKey("agent.id"), primary_key=True)
+    agent: Mapped[Agent] = relationship(back_populates="geometry")
+
+    camera: Mapped[Optional[SensorType]]
+    min_x: Mapped[Optional[float]]
+    min_y: Mapped[Optional[float]]
+    max_x: Mapped[Optional[float]]
+    max_y: Mapped[Optional[float]]
+
+    def __repr__(self) -> str:
+        return f"AgentGeometry(agent_id={self.agent_id!r}, x={self.x!r}, y={self.y!r}, z={self.z!r})"
+
+    @property
+    def bbox_2d(self):
+        return (self.min_x, self.min_y, self.max_x, self.max_y)
+
+
 class Track(Base):
     __tablename__ = "track"
     id: Mapped[int] = mapped_column(primary_key=True)
-    instance_token: Mapped[str]
+    instance_token: Mapped[str] = mapped_column(index=True)
 
     agents: Mapped[List[Agent]] = relationship(back_populates="track")
 
-    scene_id: Mapped[int] = mapped_column(ForeignKey("scene.id"))
+    scene_id: Mapped[int] = mapped_column(ForeignKey("scene.id"), index=True)
     scene: Mapped["Scene"] = relationship(back_populates="tracks")
 
     def __repr__(self) -> str:
         return f"Track(type={self.id!r}, path={self.instance_token!r})"
 
     def get_synchronized_agents(self, track):
-        cur_agents, other_agents = [], []
-        for agent in self.agents:
-            for other_agent in track.agents:
-                if agent.frame.id == other_agent.frame.id:
-                    cur_agents.append(agent)
-                    other_agents.append(other_agent)
-        assert len(cur_agents) == len(other_agents)
-        assert (
-            np.sum(
-                np.array([a.frame.timestamp for a in cur_agents])
-                - np.array([a.frame.timestamp for a in other_agents])
-            )
-            == 0
-        )
-        return cur_agents, other_agents
+        from .utils import synchronize
+
+        idx, other_idx = synchronize(self.agents, track.agents)
+        return [self.agents[i] for i in idx], [track.agents[i] for i in other_idx]
 
     def get_synchronized_ego(self):
         agents = [a for a in self.agents]
@@ -409,6 +358,7 @@ class Track(Base):
 
 class Sensor(Base, Position):
     __tablename__ = "sensor"
+    __table_args__ = (Index("ix_sensor_frame_id_type", "frame_id", "type"),)
     id: Mapped[int] = mapped_column(primary_key=True)
     sensor_token: Mapped[str]
     path: Mapped[str]
@@ -452,6 +402,7 @@ class Sensor(Base, Position):
 
 class Frame(Base):
     __tablename__ = "frame"
+    __table_args__ = (Index("ix_frame_scene_id_timestamp", "scene_id", "timestamp"),)
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[int]
 
@@ -459,6 +410,9 @@ class Frame(Base):
     scene: Mapped["Scene"] = relationship(back_populates="frames")
 
     sensors: Mapped[List[Sensor]] = relationship(back_populates="frame")
+    sensor_map: Mapped[Dict[SensorType, Sensor]] = relationship(
+        collection_class=attribute_keyed_dict("type"), viewonly=True
+    )
     agents: Mapped[List[Agent]] = relationship(back_populates="frame")
     ego: Mapped[Ego] = relationship(back_populates="frame")
 
@@ -470,10 +424,7 @@ class Frame(Base):
         return f"Frame(id={self.id!r}, timestamp={self.timestamp!r})"
 
     def get_sensor(self, sensor_type: SensorType) -> Sensor | None:
-        for sensor in self.sensors:
-            if sensor.type == sensor_type:
-                return sensor
-        return None
+        return self.sensor_map.get(sensor_type)
 
 
 class Scene(Base):
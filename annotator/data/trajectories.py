@@ -0,0 +1,385 @@
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+from sqlalchemy import Table, select
+from sqlalchemy.orm import Session
+
+from . import agent_map, ego_map_association_table
+from .models import Agent, Ego, Frame, LaneType, Map, Scene, Track
+
+MAP_ID_COLUMNS = {
+    LaneType.LANE: "lane_id",
+    LaneType.PED_CROSSING: "ped_crossing_id",
+    LaneType.DRIVABLE_AREA: "drivable_area_id",
+    LaneType.WALKWAY: "walkway_id",
+}
+
+
+class Trajectory:
+    """
+    Read-only column view of one agent track or of the ego poses of one scene.
+    Rows are ordered like `Track.agents` and `Scene.frames`, so indices returned by the
+    mining functions address the same rows as the ORM lists.
+
+    Columns (N rows): id, frame_id, timestamp, xyz (N, 3), q (N, 4, wxyz) and lane_id for both;
+    velocity for the ego; vxyz (N, 3), visibility, ped_crossing_id, drivable_area_id,
+    walkway_id and dist_from_ego for agents. Missing map ids are -1.
+    """
+
+    def __init__(
+        self, columns: Dict[str, np.ndarray], is_ego: bool, category_name: str = ""
+    ):
+        self.columns = columns
+        self.is_ego = is_ego
+        self.category_name = category_name
+
+    def __repr__(self) -> str:
+        return f"Trajectory(category_name={self.category_name!r}, is_ego={self.is_ego!r}, len={len(self)!r})"
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get("columns", {})
+        if name not in columns:
+            raise AttributeError(name)
+        return columns[name]
+
+    def __len__(self):
+        return len(self.columns["frame_id"])
+
+    def memoized(self, key, compute):
+        """
+        Values derived from the columns are computed once per view, as the columns are read-only.
+        :param key: Key of the derived value.
+        :param compute: Computes the value if it is not cached.
+        :return: The cached value.
+        """
+        cache = self.__dict__.setdefault("_cache", {})
+        if key not in cache:
+            value = compute()
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            cache[key] = value
+        return cache[key]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            idx = range(len(self))[idx]
+            idx = slice(idx, idx + 1)
+        return Trajectory(
+            {k: v[idx] for k, v in self.columns.items()},
+            self.is_ego,
+            self.category_name,
+        )
+
+    @property
+    def is_vehicle(self):
+        return self.is_ego or "vehicle" in self.category_name
+
+    @property
+    def is_human(self):
+        return not self.is_ego and "human" in self.category_name
+
+
+class TrajectoryStore:
+    """
+    Trajectories exported with `export_trajectories`, one .npy file per column so that
+    every column can be memory mapped.
+    """
+
+    def __init__(self, path: Path, mmap_mode: str | None = "r"):
+        self.path = Path(path)
+        self.arrays = {
+            p.stem: np.load(p, mmap_mode=mmap_mode)
+            for p in sorted(self.path.glob("*.npy"))
+        }
+
+    @classmethod
+    def from_session(cls, session: Session) -> "TrajectoryStore":
+        """
+        Load the trajectories directly from the database and keep them in memory.
+        """
+        store = cls.__new__(cls)
+        store.path = None
+        store.arrays = load_trajectories(session)
+        return store
+
+    def _columns(self, prefix: str, start: int, end: int):
+        return {
+            k[len(prefix) :]: v[start:end]
+            for k, v in self.arrays.items()
+            if k.startswith(prefix)
+        }
+
+    def _index(self, ids: np.ndarray, id: int):
+        idx = np.searchsorted(ids, id)
+        if idx == len(ids) or ids[idx] != id:
+            raise KeyError(id)
+        return idx
+
+    def track_ids(self, scene_id: int | None = None) -> np.ndarray:
+        if scene_id is None:
+            return self.arrays["track_id"]
+        return self.arrays["track_id"][self.arrays["track_scene_id"] == scene_id]
+
+    def scene_ids(self) -> np.ndarray:
+        return self.arrays["scene_id"]
+
+    def track(self, track_id: int) -> Trajectory:
+        idx = self._index(self.arrays["track_id"], track_id)
+        start, end = self.arrays["track_offset"][idx : idx + 2]
+        return Trajectory(
+            self._columns("agent_", start, end),
+            is_ego=False,
+            category_name=str(self.arrays["track_category_name"][idx]),
+        )
+
+    def ego(self, scene_id: int) -> Trajectory:
+        idx = self._index(self.arrays["scene_id"], scene_id)
+        start, end = self.arrays["scene_offset"][idx : idx + 2]
+        return Trajectory(self._columns("ego_", start, end), is_ego=True)
+
+    def close_tracks(self, scene_id: int, distance: float) -> Dict[int, np.ndarray]:
+        """
+        Other tracks of the scene that each track comes within `distance` of in a common frame.
+        :param scene_id: Scene of the tracks.
+        :param distance: Largest xy distance.
+        :return: Sorted ids of the close tracks by track id.
+        """
+        track_ids = self.track_ids(scene_id)
+        idx = np.searchsorted(self.arrays["track_id"], track_ids)
+        starts = self.arrays["track_offset"][idx]
+        counts = self.arrays["track_offset"][idx + 1] - starts
+        rows = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(
+            counts.sum()
+        )
+        pairs = close_pairs(
+            np.repeat(track_ids, counts),
+            self.arrays["agent_frame_id"][rows],
+            self.arrays["agent_xyz"][rows, 0:2],
+            distance,
+        )
+        pairs = np.concatenate([pairs, pairs[:, ::-1]])
+        pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+        close = np.split(
+            pairs[:, 1], np.searchsorted(pairs[:, 0], track_ids, side="right")[:-1]
+        )
+        return dict(zip(track_ids.tolist(), close))
+
+
+def close_pairs(
+    group_ids: np.ndarray, frame_ids: np.ndarray, xy: np.ndarray, distance: float
+) -> np.ndarray:
+    """
+    Pairs of groups, e.g. tracks, with rows in a common frame that are at most `distance` apart.
+    The rows are hashed into a grid of `distance` sized cells per frame, so only rows in the
+    same or neighbouring cells are compared.
+    :param group_ids: Group of each row (N).
+    :param frame_ids: Frame of each row (N).
+    :param xy: Positions of the rows (N, 2).
+    :param distance: Largest distance.
+    :return: Unique pairs of group ids (M, 2), the smaller id first.
+    """
+    if len(group_ids) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    cells = np.floor(xy / distance).astype(np.int64)
+    # keep a free cell on each side, so neighbouring keys never wrap into another row of cells
+    cells -= cells.min(axis=0) - 1
+    size = cells.max(axis=0) + 2
+    _, frame_idx = np.unique(frame_ids, return_inverse=True)
+    keys = (frame_idx * size[0] + cells[:, 0]) * size[1] + cells[:, 1]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    pairs = []
+    # half of the neighbourhood, the other half is covered by the neighbouring cells
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        neighbour_keys = keys + dx * size[1] + dy
+        starts = np.searchsorted(sorted_keys, neighbour_keys, side="left")
+        counts = np.searchsorted(sorted_keys, neighbour_keys, side="right") - starts
+        rows = np.repeat(np.arange(len(keys)), counts)
+        others = order[
+            np.repeat(starts - np.cumsum(counts) + counts, counts)
+            + np.arange(counts.sum())
+        ]
+        close = (group_ids[rows] != group_ids[others]) & (
+            np.linalg.norm(xy[rows] - xy[others], axis=1) <= distance
+        )
+        pairs.append(
+            np.sort(
+                np.stack([group_ids[rows], group_ids[others]], axis=1)[close], axis=1
+            )
+        )
+
+    return np.unique(np.concatenate(pairs).astype(np.int64), axis=0)
+
+
+def _fetch_columns(session: Session, stmt):
+    rows = session.execute(stmt).all()
+    if len(rows) == 0:
+        return [np.array([]) for _ in stmt.selected_columns]
+    return [np.array(c) for c in zip(*rows)]
+
+
+def _offsets(group_ids: np.ndarray, row_group_ids: np.ndarray):
+    return np.searchsorted(row_group_ids, group_ids, side="left").tolist() + [
+        len(row_group_ids)
+    ]
+
+
+def _map_ids(session: Session, table: Table, owner_column: str, owner_ids: np.ndarray):
+    """
+    Map ids of every layer for the given owners (agents or egos), -1 where there is none.
+    """
+    owner_map_ids = {}
+    sorter = np.argsort(owner_ids)
+    for lane_type, name in MAP_ID_COLUMNS.items():
+        owners, map_ids = _fetch_columns(
+            session,
+            select(table.c[owner_column], Map.id)
+            .join(Map, table.c.map_id == Map.id)
+            .where(Map.lane_type == lane_type),
+        )
+        assert len(np.unique(owners)) == len(owners), (
+            f"There should be max one {lane_type}"
+        )
+        ids = np.full(len(owner_ids), -1, dtype=np.int64)
+        if len(owners) > 0:
+            ids[sorter[np.searchsorted(owner_ids, owners, sorter=sorter)]] = map_ids
+        owner_map_ids[name] = ids
+    return owner_map_ids
+
+
+def load_trajectories(session: Session) -> Dict[str, np.ndarray]:
+    """
+    Read all agent tracks and ego poses of the database as contiguous columns.
+    Agents are grouped by track and egos by scene; `track_offset` and `scene_offset`
+    delimit the groups.
+    :param session: Database session.
+    :return: Columns by name, prefixed with agent_, ego_, track_ and scene_.
+    """
+    arrays = {}
+
+    scene_ids, scene_names = _fetch_columns(
+        session, select(Scene.id, Scene.name).order_by(Scene.id)
+    )
+    track_ids, track_scene_ids, instance_tokens = _fetch_columns(
+        session,
+        select(Track.id, Track.scene_id, Track.instance_token).order_by(Track.id),
+    )
+
+    (
+        agent_ids,
+        agent_track_ids,
+        frame_ids,
+        timestamps,
+        *agent_values,
+        visibility,
+        agent_category_names,
+        ego_x,
+        ego_y,
+    ) = _fetch_columns(
+        session,
+        select(
+            Agent.id,
+            Agent.track_id,
+            Agent.frame_id,
+            Frame.timestamp,
+            Agent.x,
+            Agent.y,
+            Agent.z,
+            Agent.qw,
+            Agent.qx,
+            Agent.qy,
+            Agent.qz,
+            Agent.vx,
+            Agent.vy,
+            Agent.vz,
+            Agent.visibility,
+            Agent.category_name,
+            Ego.x,
+            Ego.y,
+        )
+        .join(Agent.frame)
+        .join(Frame.ego)
+        .order_by(Agent.track_id, Agent.id),
+    )
+    agent_values = np.array(agent_values, dtype=float).reshape(10, -1).T
+    agent_xy = agent_values[:, 0:2]
+    arrays.update(
+        agent_id=agent_ids.astype(np.int64),
+        agent_frame_id=frame_ids.astype(np.int64),
+        agent_timestamp=timestamps.astype(np.int64),
+        agent_xyz=agent_values[:, 0:3],
+        agent_q=agent_values[:, 3:7],
+        agent_vxyz=agent_values[:, 7:10],
+        agent_visibility=np.array([v.value for v in visibility], dtype=np.int8),
+        agent_dist_from_ego=np.linalg.norm(
+            agent_xy - np.column_stack([ego_x, ego_y]).astype(float), axis=1
+        ),
+    )
+    for name, ids in _map_ids(session, agent_map, "agent_id", agent_ids).items():
+        arrays[f"agent_{name}"] = ids
+
+    ego_ids, ego_scene_ids, ego_frame_ids, ego_timestamps, *ego_values, velocity = (
+        _fetch_columns(
+            session,
+            select(
+                Ego.id,
+                Frame.scene_id,
+                Ego.frame_id,
+                Frame.timestamp,
+                Ego.x,
+                Ego.y,
+                Ego.z,
+                Ego.qw,
+                Ego.qx,
+                Ego.qy,
+                Ego.qz,
+                Ego.velocity,
+            )
+            .join(Ego.frame)
+            .order_by(Frame.scene_id, Frame.id),
+        )
+    )
+    ego_values = np.array(ego_values, dtype=float).reshape(7, -1).T
+    arrays.update(
+        ego_id=ego_ids.astype(np.int64),
+        ego_frame_id=ego_frame_ids.astype(np.int64),
+        ego_timestamp=ego_timestamps.astype(np.int64),
+        ego_xyz=ego_values[:, 0:3],
+        ego_q=ego_values[:, 3:7],
+        ego_velocity=velocity.astype(float),
+        ego_lane_id=_map_ids(session, ego_map_association_table, "ego_id", ego_ids)[
+            "lane_id"
+        ],
+    )
+
+    # the category of a track is the one of its first agent, as used by the mining functions
+    track_offset = np.array(_offsets(track_ids, agent_track_ids), dtype=np.int64)
+    category_names = np.append(agent_category_names.astype(str), "")[
+        np.where(track_offset[:-1] < track_offset[1:], track_offset[:-1], -1)
+    ]
+    arrays.update(
+        track_id=track_ids.astype(np.int64),
+        track_scene_id=track_scene_ids.astype(np.int64),
+        track_instance_token=instance_tokens.astype(str),
+        track_category_name=category_names,
+        track_offset=track_offset,
+        scene_id=scene_ids.astype(np.int64),
+        scene_name=scene_names.astype(str),
+        scene_offset=np.array(_offsets(scene_ids, ego_scene_ids), dtype=np.int64),
+    )
+    return arrays
+
+
+def export_trajectories(session: Session, path: Path):
+    """
+    Export all agent tracks and ego poses of the database, see `load_trajectories`.
+    :param session: Database session.
+    :param path: Output directory, one .npy file per column.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for name, array in load_trajectories(session).items():
+        np.save(path / f"{name}.npy", array)
@@ -3,7 +3,15 @@ from typing import List, Dict
 import numpy as np
 from pyquaternion import Quaternion
 
-from .models import Ego, Agent, Sensor, SensorType, Scene, Frame
+from .models import Ego, Agent, Sensor, SensorType, Scene, Frame, LaneType
+from .trajectories import MAP_ID_COLUMNS, Trajectory
+
+MAP_ID_PROPERTIES = {
+    LaneType.LANE: "get_lane_id",
+    LaneType.PED_CROSSING: "ped_crossing_id",
+    LaneType.DRIVABLE_AREA: "drivable_area_id",
+    LaneType.WALKWAY: "walkway_id",
+}
 
 
 def quaternion_yaw(q: Quaternion) -> float:
@@ -24,11 +32,95 @@ def quaternion_yaw(q: Quaternion) -> float:
     return yaw
 
 
-def get_xyz(objs: List[Ego]):
+def quaternions_yaw(q: np.ndarray) -> np.ndarray:
+    """
+    `quaternion_yaw` for many quaternions at once, in closed form.
+    The first column of the rotation matrix is scaled by the squared norm of an unnormalized quaternion,
+    which does not change its direction.
+    :param q: (N, 4) quaternions, w x y z.
+    :return: (N,) yaw angles in radians.
+    """
+    w, x, y, z = np.asarray(q, dtype=float).T
+    return np.arctan2(2 * (x * y + w * z), w * w + x * x - y * y - z * z)
+
+
+def quaternions_rotation_matrix(q: np.ndarray) -> np.ndarray:
+    """
+    Rotation matrices of many quaternions at once.
+    :param q: (N, 4) quaternions, w x y z, normalized before the conversion.
+    :return: (N, 3, 3) rotation matrices.
+    """
+    q = np.asarray(q, dtype=float)
+    w, x, y, z = (q / np.linalg.norm(q, axis=1, keepdims=True)).T
+    return np.stack([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+    ]).transpose(2, 0, 1)
+
+
+def quaternions_inverse(q: np.ndarray) -> np.ndarray:
+    """
+    Inverses of many quaternions at once.
+    :param q: (N, 4) quaternions, w x y z.
+    :return: (N, 4) inverse quaternions.
+    """
+    q = np.asarray(q, dtype=float)
+    return q * np.array([1.0, -1.0, -1.0, -1.0]) / np.sum(q * q, axis=1, keepdims=True)
+
+
+def quaternions_multiply(q: np.ndarray, r: np.ndarray) -> np.ndarray:
+    """
+    Hamilton products q * r of many quaternions at once, i.e. the rotation r followed by q.
+    :param q: (N, 4) or (4,) quaternions, w x y z.
+    :param r: (N, 4) or (4,) quaternions, w x y z.
+    :return: (N, 4) quaternions.
+    """
+    qw, qx, qy, qz = np.moveaxis(np.asarray(q, dtype=float), -1, 0)
+    rw, rx, ry, rz = np.moveaxis(np.asarray(r, dtype=float), -1, 0)
+    return np.stack(
+        [
+            qw * rw - qx * rx - qy * ry - qz * rz,
+            qw * rx + qx * rw + qy * rz - qz * ry,
+            qw * ry - qx * rz + qy * rw + qz * rx,
+            qw * rz + qx * ry - qy * rx + qz * rw,
+        ],
+        axis=-1,
+    )
+
+
+def transform_to_frame(
+    xyz: np.ndarray, frame_xyz: np.ndarray, frame_q: np.ndarray
+) -> np.ndarray:
+    """
+    Express global positions in the coordinate frames of reference poses, e.g. agents in the ego frame.
+    A single reference pose is broadcast to all positions.
+    :param xyz: (N, 3) global positions.
+    :param frame_xyz: (N, 3) or (3,) positions of the reference poses.
+    :param frame_q: (N, 4) or (4,) orientations of the reference poses, w x y z.
+    :return: (N, 3) relative positions.
+    """
+    rotation = quaternions_rotation_matrix(np.reshape(frame_q, (-1, 4)))
+    delta = np.asarray(xyz, dtype=float) - np.asarray(frame_xyz, dtype=float)
+    # the inverse rotation is the transposed matrix
+    return np.einsum("nji,nj->ni", rotation, np.atleast_2d(delta))
+
+
+def is_agent(objs: List[Agent] | List[Ego] | Trajectory):
+    if isinstance(objs, Trajectory):
+        return not objs.is_ego
+    return isinstance(objs[0], Agent)
+
+
+def get_xyz(objs: List[Ego] | Trajectory):
+    if isinstance(objs, Trajectory):
+        return np.asarray(objs.xyz)
     return np.array([[obj.x, obj.y, obj.z] for obj in objs])
 
 
-def get_xy(objs: List[Ego] | List[Agent]):
+def get_xy(objs: List[Ego] | List[Agent] | Trajectory):
+    if isinstance(objs, Trajectory):
+        return np.asarray(objs.xyz[:, :2])
     return np.array([[obj.x, obj.y] for obj in objs])
 
 
@@ -36,20 +128,39 @@ def get_wlh(objs: List[Agent]):
     return np.array([[obj.w, obj.l, obj.h] for obj in objs])
 
 
-def get_q_xyzw(objs: List[Ego]):
+def get_q_xyzw(objs: List[Ego] | Trajectory):
+    if isinstance(objs, Trajectory):
+        return np.asarray(objs.q[:, [1, 2, 3, 0]])
     return np.array([[obj.qx, obj.qy, obj.qz, obj.qw] for obj in objs])
 
 
-def get_yaw(objs: List[Agent] | List[Ego]):
-    return np.array([quaternion_yaw(Quaternion(*o.qwxyz)) for o in objs])
+def get_q_wxyz(objs: List[Ego] | List[Agent] | Trajectory):
+    if isinstance(objs, Trajectory):
+        return np.asarray(objs.q)
+    return np.array([obj.qwxyz for obj in objs])
+
 
+def get_yaw(objs: List[Agent] | List[Ego] | Trajectory):
+    if isinstance(objs, Trajectory):
+        return objs.memoized("yaw", lambda: quaternions_yaw(np.asarray(objs.q)))
+    return quaternions_yaw(np.reshape(get_q_wxyz(objs), (-1, 4)))
 
-def get_timestamp(objs: List[Frame]):
+
+def get_timestamp(objs: List[Frame] | Trajectory):
+    if isinstance(objs, Trajectory):
+        return np.asarray(objs.timestamp)
     return np.array([obj.timestamp for obj in objs])
 
 
-def get_vel(objs: List[Agent] | List[Ego]):
-    if isinstance(objs[0], Agent):
+def get_vel(objs: List[Agent] | List[Ego] | Trajectory):
+    """
+    Planar speed of agents, ego speed estimated from its poses.
+    """
+    if isinstance(objs, Trajectory):
+        if objs.is_ego:
+            return np.asarray(objs.velocity)
+        return np.linalg.norm(objs.vxyz[:, :2], axis=1)
+    elif isinstance(objs[0], Agent):
         vel = np.array([[obj.vx, obj.vy] for obj in objs])
         return np.linalg.norm(vel, axis=1)
     elif isinstance(objs[0], Ego):
@@ -58,6 +169,73 @@ def get_vel(objs: List[Agent] | List[Ego]):
         raise ValueError("Object not supported")
 
 
+def get_speed(objs: List[Agent] | List[Ego] | Trajectory):
+    """
+    The `velocity` property of every object, i.e. the 3D speed of agents.
+    """
+    if isinstance(objs, Trajectory):
+        if objs.is_ego:
+            return np.asarray(objs.velocity)
+        # einsum rounds like the np.linalg.norm of a single vector used by Agent.velocity
+        return np.sqrt(np.einsum("ij,ij->i", objs.vxyz, objs.vxyz))
+    return np.array([o.velocity for o in objs])
+
+
+def get_map_ids(objs: List[Agent] | List[Ego] | Trajectory, lane_type: LaneType):
+    """
+    Id of the map record of the given layer each object is on, -1 if there is none.
+    """
+    if isinstance(objs, Trajectory):
+        return np.asarray(getattr(objs, MAP_ID_COLUMNS[lane_type]))
+    return np.array([getattr(o, MAP_ID_PROPERTIES[lane_type]) for o in objs])
+
+
+def get_dist_from_ego(objs: List[Agent] | Trajectory):
+    if isinstance(objs, Trajectory):
+        return np.asarray(objs.dist_from_ego)
+    return np.array([o.dist_from_ego for o in objs])
+
+
+def get_frame_ids(objs: List[Agent] | List[Ego] | Trajectory):
+    if isinstance(objs, Trajectory):
+        return np.asarray(objs.frame_id)
+    return np.array([obj.frame_id for obj in objs], dtype=np.int64)
+
+
+def synchronize(
+    objs: List[Agent] | List[Ego] | Trajectory,
+    other_objs: List[Agent] | List[Ego] | Trajectory,
+):
+    """
+    Match the frames both sequences have in common by intersecting their frame ids,
+    instead of comparing every pair of objects.
+    :param objs: Objects with at most one object per frame, e.g. the agents of a track.
+    :param other_objs: Objects with at most one object per frame.
+    :return: Indices of the common frames into objs and into other_objs, in frame id order.
+    """
+    _, idx, other_idx = np.intersect1d(
+        get_frame_ids(objs),
+        get_frame_ids(other_objs),
+        assume_unique=True,
+        return_indices=True,
+    )
+    return idx, other_idx
+
+
+def get_xyz_in_other(
+    objs: List[Agent] | List[Ego] | Trajectory,
+    other_objs: List[Agent] | List[Ego] | Trajectory,
+):
+    """
+    Positions of objs in the coordinate frames of the synchronized other_objs.
+    """
+    return transform_to_frame(
+        get_xyz(objs).reshape(-1, 3),
+        get_xyz(other_objs).reshape(-1, 3),
+        get_q_wxyz(other_objs).reshape(-1, 4),
+    )
+
+
 def compute_vel(objs: List[Ego]):
     xy = get_xy(objs)
     ts = get_timestamp([e.frame for e in objs])
@@ -70,6 +248,33 @@ def compute_vel(objs: List[Ego]):
     return vel
 
 
+def compute_vel_grouped(groups: np.ndarray, ts: np.ndarray, xy: np.ndarray):
+    """
+    `compute_vel` for many sequences at once.
+    :param groups: (N,) sequence id per sample, every sequence contiguous and sorted by time.
+    :param ts: (N,) timestamps in microseconds.
+    :param xy: (N, 2) positions.
+    :return: (N,) velocities in m/s.
+    """
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    lengths = np.diff(np.r_[starts, len(groups)])
+
+    # the difference across a sequence border is overwritten by the extrapolation
+    vel = np.empty(len(groups))
+    vel[:-1] = np.linalg.norm(xy[1:] - xy[:-1], axis=1, ord=2) / (
+        (ts[1:] - ts[:-1]) * 1e-6
+    )
+
+    # extrapolate last value, one quadratic fit for all sequences of the same length
+    for length in np.unique(lengths):
+        seq_starts = starts[lengths == length]
+        n = length - 1
+        seq_vel = vel[seq_starts[:, None] + np.arange(n)]
+        coefficients_quad = np.polyfit(np.arange(n), seq_vel.T, 2)
+        vel[seq_starts + n] = np.polyval(coefficients_quad, n)
+    return vel
+
+
 def get_sensors(objs: List[Agent]):
     sensors = {}
     for obj in objs:
@@ -78,3 +283,243 @@ def get_sensors(objs: List[Agent]):
                 sensors[sensor.type] = []
             sensors[sensor.type].append(sensor)
     return sensors
+
+
+def get_sensor_arrays(frames: List[Frame], sensor_types=tuple(SensorType)):
+    """
+    Paths and calibrations of the given sensors of many frames as arrays.
+    :param frames: Frames, their `sensor_map` is best loaded with one query for all of them.
+    :param sensor_types: Sensors to gather, in this order.
+    :return: Dictionary with (F, S) paths, (F, S, 3) positions, (F, S, 4) orientations (w x y z) and
+        (F, S, 3, 3) camera matrices, None and NaN for missing sensors and the camera matrices of the lidar.
+    """
+    sensors = [[f.get_sensor(t) for t in sensor_types] for f in frames]
+    return dict(
+        path=np.array(
+            [[None if s is None else s.path for s in ss] for ss in sensors],
+            dtype=object,
+        ).reshape(len(frames), len(sensor_types)),
+        xyz=np.array(
+            [[[np.nan] * 3 if s is None else s.xyz for s in ss] for ss in sensors],
+            dtype=float,
+        ).reshape(len(frames), len(sensor_types), 3),
+        q_wxyz=np.array(
+            [[[np.nan] * 4 if s is None else s.qwxyz for s in ss] for ss in sensors],
+            dtype=float,
+        ).reshape(len(frames), len(sensor_types), 4),
+        camera_matrix=np.array(
+            [
+                [
+                    s.camera_matrix
+                    if s is not None and s.is_camera
+                    else np.full((3, 3), np.nan)
+                    for s in ss
+                ]
+                for ss in sensors
+            ],
+            dtype=float,
+        ).reshape(len(frames), len(sensor_types), 3, 3),
+    )
+
+
+def to_sensor_frame(
+    xyz: np.ndarray,
+    q: np.ndarray,
+    ego_xyz: np.ndarray,
+    ego_q: np.ndarray,
+    sensor_xyz: np.ndarray,
+    sensor_q: np.ndarray,
+):
+    """
+    Transform global poses to the frames of calibrated sensors, i.e. global -> ego -> sensor.
+    :param xyz: (N, 3) global positions.
+    :param q: (N, 4) global orientations, w x y z.
+    :param ego_xyz: (N, 3) ego positions.
+    :param ego_q: (N, 4) ego orientations.
+    :param sensor_xyz: (N, 3) sensor positions relative to the ego.
+    :param sensor_q: (N, 4) sensor orientations relative to the ego.
+    :return: (N, 3) positions and (N, 4) orientations in the sensor frames.
+    """
+    xyz = transform_to_frame(
+        transform_to_frame(xyz, ego_xyz, ego_q), sensor_xyz, sensor_q
+    )
+    q = quaternions_multiply(
+        quaternions_inverse(sensor_q),
+        quaternions_multiply(quaternions_inverse(ego_q), q),
+    )
+    return xyz, q
+
+
+def get_lidar_poses(agents: List[Agent]):
+    """
+    `Agent.get_position_in_lidar_frame` for many agents at once.
+    :param agents: Agents with their frames, ego poses and sensors.
+    :return: (N, 3) positions and (N, 4) orientations in the frames of the top lidar.
+    """
+    if len(agents) == 0:
+        return np.empty((0, 3)), np.empty((0, 4))
+
+    egos = [a.frame.ego for a in agents]
+    lidars = get_sensor_arrays([a.frame for a in agents], [SensorType.LIDAR_TOP])
+    return to_sensor_frame(
+        get_xyz(agents),
+        get_q_wxyz(agents),
+        get_xyz(egos),
+        get_q_wxyz(egos),
+        lidars["xyz"][:, 0],
+        lidars["q_wxyz"][:, 0],
+    )
+
+
+CAMERAS = [
+    SensorType.CAM_FRONT,
+    SensorType.CAM_FRONT_RIGHT,
+    SensorType.CAM_BACK_RIGHT,
+    SensorType.CAM_BACK,
+    SensorType.CAM_BACK_LEFT,
+    SensorType.CAM_FRONT_LEFT,
+]
+
+# 3D bounding box corners of a unit box. (Convention: x points forward, y to the left, z up.)
+BOX_CORNERS = (
+    np.array([
+        [1, 1, 1, 1, -1, -1, -1, -1],
+        [1, -1, -1, 1, 1, -1, -1, 1],
+        [1, 1, -1, -1, 1, 1, -1, -1],
+    ]).T
+    / 2
+)
+
+_PAIRS = np.array([(i, j) for i in range(8) for j in range(i + 1, 8)])
+_TRIANGLES = np.array([
+    (i, j, k) for i in range(8) for j in range(i + 1, 8) for k in range(j + 1, 8)
+])
+
+
+def _in_canvas(points: np.ndarray, width: float, height: float) -> np.ndarray:
+    return (
+        (points[..., 0] >= 0)
+        & (points[..., 0] <= width)
+        & (points[..., 1] >= 0)
+        & (points[..., 1] <= height)
+    )
+
+
+def clip_bbox_2d(points: np.ndarray, valid: np.ndarray, imsize=(1600, 900)):
+    """
+    Bounding boxes of the intersections of the convex hulls of projected box corners and the image canvas.
+    The intersection is a convex polygon, its vertices are corners inside the canvas, crossings of the hull
+    edges with the canvas border and canvas corners inside the hull. All segments between two corners and
+    all triangles of three corners are tested, which includes the hull edges and covers the hull.
+    :param points: (M, 8, 2) projected corners.
+    :param valid: (M, 8) corners in front of the camera, at least three are needed for a polygon.
+    :param imsize: Size of the image canvas.
+    :return: (M, 4) min_x, min_y, max_x, max_y, NaN if the hull does not intersect the canvas.
+    """
+    width, height = imsize
+    points = np.where(valid[..., None], points, np.nan)
+    polygon = np.count_nonzero(valid, axis=1) >= 3
+    bbox = np.full((len(points), 4), np.nan)
+
+    # hulls inside the canvas are their own intersection
+    inside = polygon & np.all(_in_canvas(points, width, height) | ~valid, axis=1)
+    bbox[inside, :2] = np.nanmin(points[inside], axis=1)
+    bbox[inside, 2:] = np.nanmax(points[inside], axis=1)
+
+    # the others are clipped if their bounds overlap the canvas
+    lo = np.min(np.where(valid[..., None], points, np.inf), axis=1)
+    hi = np.max(np.where(valid[..., None], points, -np.inf), axis=1)
+    clipped = (
+        polygon
+        & ~inside
+        & (hi[:, 0] >= 0)
+        & (lo[:, 0] <= width)
+        & (hi[:, 1] >= 0)
+        & (lo[:, 1] <= height)
+    )
+    points = points[clipped]
+    candidates = [points]
+
+    # hull edges crossing the canvas border
+    p, q = points[:, _PAIRS[:, 0]], points[:, _PAIRS[:, 1]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for axis, value in [(0, 0.0), (0, width), (1, 0.0), (1, height)]:
+            t = (value - p[..., axis]) / (q[..., axis] - p[..., axis])
+            crossing = p + t[..., None] * (q - p)
+            crossing[..., axis] = value
+            crossing[~((t >= 0) & (t <= 1))] = np.nan
+            candidates.append(crossing)
+
+    # canvas corners inside the hull
+    a, b, c = (points[:, _TRIANGLES[:, i], None] for i in range(3))
+    canvas = np.array([[0.0, 0.0], [width, 0.0], [width, height], [0.0, height]])
+
+    def cross(o, u, v):
+        return (u[..., 0] - o[..., 0]) * (v[..., 1] - o[..., 1]) - (
+            u[..., 1] - o[..., 1]
+        ) * (v[..., 0] - o[..., 0])
+
+    d1, d2, d3 = cross(a, b, canvas), cross(b, c, canvas), cross(c, a, canvas)
+    corner_inside = (
+        ~(((d1 < 0) | (d2 < 0) | (d3 < 0)) & ((d1 > 0) | (d2 > 0) | (d3 > 0)))
+        & ~np.isnan(d1 + d2 + d3)
+        & (cross(a, b, c) != 0)  # not a single point
+    )
+    candidates.append(np.where(corner_inside.any(axis=1)[..., None], canvas, np.nan))
+
+    candidates = np.concatenate(candidates, axis=1)
+    in_canvas = _in_canvas(candidates, width, height)
+    candidates[~in_canvas] = np.nan
+    visible = np.flatnonzero(clipped)[in_canvas.any(axis=1)]
+    candidates = candidates[in_canvas.any(axis=1)]
+    bbox[visible, :2] = np.nanmin(candidates, axis=1)
+    bbox[visible, 2:] = np.nanmax(candidates, axis=1)
+    return bbox
+
+
+def get_bbox_2d(agents: List[Agent], imsize=(1600, 900)):
+    """
+    2D bounding boxes of agents in the first camera (in the order of `CAMERAS`) they are visible in.
+    All corners of all agents are projected into all cameras at once.
+    :param agents: Agents with their frames, ego poses and sensors.
+    :param imsize: Size of the image canvas.
+    :return: (N, 4) boxes as min_x, min_y, max_x, max_y and the camera of every agent,
+        NaN and None for agents that are not visible in any camera.
+    """
+    if len(agents) == 0:
+        return np.empty((0, 4)), []
+
+    egos = [a.frame.ego for a in agents]
+    sensors = get_sensor_arrays([a.frame for a in agents], CAMERAS)
+    sensor_xyz, sensor_q = sensors["xyz"], sensors["q_wxyz"]
+    camera_matrix = sensors["camera_matrix"]
+
+    # global -> ego -> sensor
+    xyz, q = to_sensor_frame(
+        np.repeat(get_xyz(agents), len(CAMERAS), axis=0),
+        np.repeat(get_q_wxyz(agents), len(CAMERAS), axis=0),
+        np.repeat(get_xyz(egos), len(CAMERAS), axis=0),
+        np.repeat(get_q_wxyz(egos), len(CAMERAS), axis=0),
+        sensor_xyz.reshape(-1, 3),
+        sensor_q.reshape(-1, 4),
+    )
+
+    # corners in the sensor frames
+    lwh = np.array([[a.length, a.width, a.height] for a in agents], dtype=float)
+    corners = np.repeat(BOX_CORNERS * lwh[:, None], len(CAMERAS), axis=0)
+    corners = np.einsum("mij,mkj->mki", quaternions_rotation_matrix(q), corners)
+    corners = corners + xyz[:, None]
+
+    # project to the image planes, only the corners in front of the cameras
+    points = np.einsum("mij,mkj->mki", camera_matrix.reshape(-1, 3, 3), corners)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        points = points[..., :2] / points[..., 2:3]
+    bbox = clip_bbox_2d(points, corners[..., 2] > 0, imsize)
+    bbox = bbox.reshape(len(agents), len(CAMERAS), 4)
+
+    visible = ~np.isnan(bbox[..., 0])
+    first = np.argmax(visible, axis=1)
+    found = visible.any(axis=1)
+    bboxes = np.where(found[:, None], bbox[np.arange(len(agents)), first], np.nan)
+    cameras = [CAMERAS[i] if f else None for i, f in zip(first, found)]
+    return bboxes, cameras
@@ -1,14 +1,15 @@
 from typing import List
 
 import numpy as np
-from ..data.models import Ego, Agent, VisibilityType
+from ..data.models import Ego, Agent, LaneType, VisibilityType
+from ..data.trajectories import Trajectory
 from ..data import utils as adu
 
 
 def merge_true_islands_center(data):
     """
     Merges consecutive True values in a list into a single True at the center
-    of the island.  For even length islands, the right-center is chosen.
+    of the island.  For even length islands, the left-center is chosen.
 
     Args:
         data: A list of boolean values.
@@ -17,31 +18,112 @@ def merge_true_islands_center(data):
         A new list with merged True islands.
     """
 
-    n = len(data)
-    result = [False] * n
+    mask = np.asarray(data, dtype=bool)
+    # most masks of a track have no island at all
+    if not mask.any():
+        return [False] * len(mask)
+    return merge_true_islands_center_batched(mask[None])[0].tolist()
 
-    start_index = -1  # Start index of the current island
-    island_length = 0  # Length of the current island
 
-    for i in range(n):
-        if data[i]:
-            if island_length == 0:  # Start of a new island
-                start_index = i
-            island_length += 1
-        else:  # Encountered a False value
-            if island_length > 0:  # Process the previous island (if any)
-                center_index = (
-                    start_index + (island_length - 1) // 2
-                )  # Integer division for center
-                result[center_index] = True
-            island_length = 0  # Reset for the next potential island
+def merge_true_islands_center_batched(masks):
+    """
+    Merges the True islands of every mask in a stack of equally long masks,
+    e.g. one per predicate or per track pair, see `merge_true_islands_center`.
+
+    Args:
+        masks: Boolean array (M, N).
+
+    Returns:
+        Boolean array (M, N) with merged True islands in every row.
+    """
+
+    masks = np.asarray(masks, dtype=bool)
+    m, n = masks.shape
+    # padding every row with False keeps the islands of consecutive rows apart
+    padded = np.zeros((m, n + 2), dtype=np.int8)
+    padded[:, 1:-1] = masks
+    # islands of the flattened stack start after a step up and end after a step down
+    edges = np.flatnonzero(np.diff(padded.ravel()))
+    starts, ends = edges[::2] + 1, edges[1::2] + 1
+
+    result = np.zeros(m * (n + 2), dtype=bool)
+    result[starts + (ends - starts - 1) // 2] = True
+    return result.reshape(m, n + 2)[:, 1:-1]
+
+
+def _lane_ids(objs: List[Ego | Agent] | Trajectory):
+    lanes = adu.get_map_ids(objs, LaneType.LANE).astype(float)
+    lanes[lanes == -1] = np.nan
+    return lanes
 
-    # Handle any island that might be at the very end of the list
-    if island_length > 0:
-        center_index = start_index + (island_length - 1) // 2
-        result[center_index] = True
 
-    return result
+# per-frame features the predicates are evaluated on
+FEATURES = {
+    "xy": adu.get_xy,
+    "vel": adu.get_vel,
+    "speed": adu.get_speed,
+    "yaw": adu.get_yaw,
+    "yaw_deg": lambda objs: np.rad2deg(adu.get_yaw(objs)),
+    "lane": _lane_ids,
+    "ped_crossing": lambda objs: adu.get_map_ids(objs, LaneType.PED_CROSSING),
+    "drivable_area": lambda objs: adu.get_map_ids(objs, LaneType.DRIVABLE_AREA),
+    "walkway": lambda objs: adu.get_map_ids(objs, LaneType.WALKWAY),
+    "dist_from_ego": adu.get_dist_from_ego,
+}
+
+
+def _sliding_windows(values: np.ndarray, frames: int) -> np.ndarray:
+    w = np.lib.stride_tricks.sliding_window_view(values, frames, axis=0)
+    # windows of per-frame vectors are (N - frames + 1, frames, D)
+    return w if w.ndim == 2 else w.transpose(0, 2, 1)
+
+
+def windows(objs: List[Ego | Agent] | Trajectory, feature: str, frames: int):
+    """
+    Sliding windows over a per-frame feature of objs.
+    For column views they are computed once and shared by all predicates evaluated on the view.
+    :param objs: Objects of a track or the ego, or a column view of them.
+    :param feature: Name of the feature, see `FEATURES`.
+    :param frames: Window length.
+    :return: Windows (N - frames + 1, frames) or (N - frames + 1, frames, D).
+    """
+
+    def compute():
+        return _sliding_windows(FEATURES[feature](objs), frames)
+
+    if isinstance(objs, Trajectory):
+        return objs.memoized((feature, frames), compute)
+    return compute()
+
+
+# features of objs relative to the synchronized other_objs
+PAIR_FEATURES = {
+    "xyz_in_other": lambda objs, other_objs, frames: _sliding_windows(
+        adu.get_xyz_in_other(objs, other_objs), frames
+    ),
+    "delta_xy": lambda objs, other_objs, frames: np.linalg.norm(
+        windows(objs, "xy", frames) - windows(other_objs, "xy", frames), axis=-1
+    ),
+}
+
+
+def pair_windows(
+    objs: List[Ego | Agent] | Trajectory,
+    other_objs: List[Ego | Agent] | Trajectory,
+    feature: str,
+    frames: int,
+):
+    """
+    Like `windows`, for a feature of objs relative to the synchronized other_objs.
+    """
+
+    def compute():
+        # the cached value references other_objs, so its id is not reused while cached
+        return other_objs, PAIR_FEATURES[feature](objs, other_objs, frames)
+
+    if isinstance(objs, Trajectory):
+        return objs.memoized((feature, frames, id(other_objs)), compute)[1]
+    return compute()[1]
 
 
 def is_accelerating(
@@ -50,12 +132,10 @@ def is_accelerating(
     if not objs[0].is_vehicle:
         return (None, None)
 
-    vel = np.array([o.velocity for o in objs])
-
-    if vel.shape[0] < frames:
+    if len(objs) < frames:
         return (None, None)
 
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
+    vel_w = windows(objs, "speed", frames)
     acc_w = np.diff(vel_w, n=1, axis=1)
     mask = np.all(acc_w > 0.1, axis=1) & (vel_w[:, -1] - vel_w[:, 0] > threshold_ms)
 
@@ -71,12 +151,10 @@ def is_decelerating(
     if not objs[0].is_vehicle:
         return (None, None)
 
-    vel = np.array([o.velocity for o in objs])
-
-    if vel.shape[0] < frames:
+    if len(objs) < frames:
         return (None, None)
 
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
+    vel_w = windows(objs, "speed", frames)
     acc_w = np.diff(vel_w, n=1, axis=1)
     mask = (
         np.all(acc_w < 0.1, axis=1)  # decelerating between frames
@@ -94,12 +172,10 @@ def is_stopping(objs: List[Ego | Agent], frames: int = 6, threshold_ms: float =
     if not objs[0].is_vehicle:
         return (None, None)
 
-    vel = np.array([o.velocity for o in objs])
-
-    if vel.shape[0] < frames:
+    if len(objs) < frames:
         return (None, None)
 
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
+    vel_w = windows(objs, "speed", frames)
     acc_w = np.diff(vel_w, n=1, axis=1)
     mask = (
         np.all(acc_w < 0.1, axis=1)  # decelerating between frames
@@ -127,34 +203,14 @@ def is_agent_overtaking_agent(
 
     is_human = objs[0].is_human
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-    yaw = np.rad2deg(adu.get_yaw(objs))
-    xy_in_other = np.array([
-        o.translate_rotate_xyz(-np.array(oo.xyz), oo.q.inverse)
-        for o, oo in zip(objs, other_objs)
-    ])[:, 0:2]
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
+    v_w = windows(objs, "vel", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
 
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
+    other_v_w = windows(other_objs, "vel", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
-
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
-
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
     delta_v = v_w - other_v_w
 
     mask = (
@@ -185,34 +241,14 @@ def is_agent_passing_agent(objs: List[Agent], other_objs: List[Agent], frames=6)
 
     is_human = objs[0].is_human
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-    yaw = np.rad2deg(adu.get_yaw(objs))
-    xy_in_other = np.array([
-        o.translate_rotate_xyz(-np.array(oo.xyz), oo.q.inverse)
-        for o, oo in zip(objs, other_objs)
-    ])[:, 0:2]
+    v_w = windows(objs, "vel", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
 
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
+    other_v_w = windows(other_objs, "vel", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
-
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
     mask = (
         (delta_xy.max(axis=1) < (2.0 if is_human else 10.0))  # close to other
         & (v_w.min(axis=1) > (0.5 if is_human else 2.0))  # moving
@@ -234,38 +270,20 @@ def is_agent_following_agent(
     if (len(objs) < frames) or (len(other_objs) < frames):
         return (None, None)
 
-    if isinstance(objs[0], Agent) and not objs[0].is_vehicle:
+    if adu.is_agent(objs) and not objs[0].is_vehicle:
         return (None, None)
 
-    if isinstance(other_objs[0], Agent) and not other_objs[0].is_vehicle:
+    if adu.is_agent(other_objs) and not other_objs[0].is_vehicle:
         return (None, None)
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-
     # xy in ego
-    xy_in_other = [
-        o.translate_rotate_xyz(-np.array(e.xyz), e.q.inverse)
-        for o, e in zip(objs, other_objs)
-    ]
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
+    v_w = windows(objs, "vel", frames)
 
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
+    other_v_w = windows(other_objs, "vel", frames)
 
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
     delta_v = v_w - other_v_w
 
     mask = (
@@ -289,38 +307,20 @@ def is_agent_leading_agent(
     if (len(objs) < frames) or (len(other_objs) < frames):
         return (None, None)
 
-    if isinstance(objs[0], Agent) and not objs[0].is_vehicle:
+    if adu.is_agent(objs) and not objs[0].is_vehicle:
         return (None, None)
 
-    if isinstance(other_objs[0], Agent) and not other_objs[0].is_vehicle:
+    if adu.is_agent(other_objs) and not other_objs[0].is_vehicle:
         return (None, None)
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-
     # xy in ego
-    xy_in_other = [
-        o.translate_rotate_xyz(-np.array(e.xyz), e.q.inverse)
-        for o, e in zip(objs, other_objs)
-    ]
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
+    v_w = windows(objs, "vel", frames)
 
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
+    other_v_w = windows(other_objs, "vel", frames)
 
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
     delta_v = v_w - other_v_w
 
     mask = (
@@ -342,15 +342,10 @@ def is_changing_lanes(objs: List[Ego | Agent], frames: int = 6):
     if not objs[0].is_vehicle:
         return (None, None)
 
-    lanes = [o.get_lane_id for o in objs]
-    lanes = np.array(lanes, dtype=float)
-
-    if lanes.size < frames:
+    if len(objs) < frames:
         return (None, None)
 
-    lanes[lanes == -1] = np.nan
-
-    lane_w = np.lib.stride_tricks.sliding_window_view(lanes, frames, axis=0)
+    lane_w = windows(objs, "lane", frames)
     lane_delta = lane_w[:, :-1] - lane_w[:, 1:]
     lane_delta = np.abs(np.nan_to_num(lane_delta))
 
@@ -367,12 +362,10 @@ def is_truning_left(
 ):
     if not objs[0].is_vehicle:
         return (None, None)
-    yaw = np.array([o.yaw for o in objs])
-
-    if yaw.size < frames:
+    if len(objs) < frames:
         return (None, None)
 
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
+    yaw_w = windows(objs, "yaw", frames)
     yaw_w_diff = np.arctan2(
         np.sin(yaw_w[:, -1] - yaw_w[:, 0]),
         np.cos(yaw_w[:, -1] - yaw_w[:, 0]),
@@ -392,12 +385,10 @@ def is_truning_right(
     if not objs[0].is_vehicle:
         return (None, None)
 
-    yaw = np.array([o.yaw for o in objs])
-
-    if yaw.size < frames:
+    if len(objs) < frames:
         return (None, None)
 
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
+    yaw_w = windows(objs, "yaw", frames)
     yaw_w_diff = np.arctan2(
         np.sin(yaw_w[:, -1] - yaw_w[:, 0]),
         np.cos(yaw_w[:, -1] - yaw_w[:, 0]),
@@ -415,12 +406,10 @@ def is_u_turn(objs: List[Ego | Agent], frames: int = 6, threshold_rad: float = 1
     if not objs[0].is_vehicle:
         return (None, None)
 
-    yaw = np.array([o.yaw for o in objs])
-
-    if yaw.size < frames:
+    if len(objs) < frames:
         return (None, None)
 
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
+    yaw_w = windows(objs, "yaw", frames)
     yaw_w_diff = np.arctan2(
         np.sin(yaw_w[:, -1] - yaw_w[:, 0]),
         np.cos(yaw_w[:, -1] - yaw_w[:, 0]),
@@ -438,14 +427,11 @@ def is_reversing(objs: List[Ego | Agent], frames: int = 6):
     if not objs[0].is_vehicle:
         return (None, None)
 
-    vel = np.array([o.velocity for o in objs])
-    yaw = np.array([o.yaw for o in objs])
-
-    if yaw.size < frames:
+    if len(objs) < frames:
         return (None, None)
 
     # estimate yaw
-    xyz = np.array([o.xyz for o in objs])
+    xyz = adu.get_xyz(objs)
     delta = xyz[1:, :2] - xyz[:-1, :2]
     est_yaw = np.arctan2(delta[:, 1], delta[:, 0])
     # extrapolate last value
@@ -454,8 +440,8 @@ def is_reversing(objs: List[Ego | Agent], frames: int = 6):
     extrapolated_value_quad = polynomial_quad(len(est_yaw))
     est_yaw = np.append(est_yaw, extrapolated_value_quad)
 
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
+    vel_w = windows(objs, "speed", frames)
+    yaw_w = windows(objs, "yaw", frames)
     est_yaw_w = np.lib.stride_tricks.sliding_window_view(est_yaw, frames, axis=0)
 
     yaw_w_delta = np.arctan2(
@@ -482,31 +468,17 @@ def is_agent_waiting_cross(
     if (len(objs) < frames) or (len(other_objs) < frames):
         return (None, None)
 
-    if isinstance(objs[0], Agent) and not objs[0].is_vehicle:
+    if adu.is_agent(objs) and not objs[0].is_vehicle:
         return (None, None)
 
-    if isinstance(other_objs[0], Agent) and not other_objs[0].is_human:
+    if adu.is_agent(other_objs) and not other_objs[0].is_human:
         return (None, None)
 
-    xy = np.array([o.xy for o in objs])
-    vel = np.array([o.velocity for o in objs])
+    vel_w = windows(objs, "speed", frames)
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
-
-    other_xy = np.array([o.xy for o in other_objs])
-    other_ped_crossing = [o.ped_crossing_id for o in other_objs]
+    other_ped_crossing_w = windows(other_objs, "ped_crossing", frames)
 
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_ped_crossing_w = np.lib.stride_tricks.sliding_window_view(
-        other_ped_crossing, frames, axis=0
-    )
-
-    delta_xy_w = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy_w = pair_windows(objs, other_objs, "delta_xy", frames)
 
     mask = (
         (vel_w.mean(axis=1) < 0.55)  # vehicle almost stopped
@@ -524,17 +496,9 @@ def is_crossing(objs: List[Agent], frames: int = 6):
     if len(objs) < frames or not objs[0].is_human:
         return (None, None)
 
-    vel = np.array([o.velocity for o in objs])
-    ped_crossing = np.array([o.ped_crossing_id for o in objs])
-    dist_from_ego = np.array([o.dist_from_ego for o in objs])
-
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
-    ped_crossing_w = np.lib.stride_tricks.sliding_window_view(
-        ped_crossing, frames, axis=0
-    )
-    dist_from_ego_w = np.lib.stride_tricks.sliding_window_view(
-        dist_from_ego, frames, axis=0
-    )
+    vel_w = windows(objs, "speed", frames)
+    ped_crossing_w = windows(objs, "ped_crossing", frames)
+    dist_from_ego_w = windows(objs, "dist_from_ego", frames)
 
     mask = (
         np.all(ped_crossing_w > 0, axis=1)  # on pedestrian crossing
@@ -552,21 +516,10 @@ def is_jaywalking(objs: List[Agent], frames: int = 6):
     if len(objs) < frames or not objs[0].is_human:
         return (None, None)
 
-    vel = np.array([o.velocity for o in objs])
-    ped_crossing = np.array([o.ped_crossing_id for o in objs])
-    drivable_area = np.array([o.drivable_area_id for o in objs])
-    dist_from_ego = np.array([o.dist_from_ego for o in objs])
-
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
-    ped_crossing_w = np.lib.stride_tricks.sliding_window_view(
-        ped_crossing, frames, axis=0
-    )
-    drivable_area_w = np.lib.stride_tricks.sliding_window_view(
-        drivable_area, frames, axis=0
-    )
-    dist_from_ego_w = np.lib.stride_tricks.sliding_window_view(
-        dist_from_ego, frames, axis=0
-    )
+    vel_w = windows(objs, "speed", frames)
+    ped_crossing_w = windows(objs, "ped_crossing", frames)
+    drivable_area_w = windows(objs, "drivable_area", frames)
+    dist_from_ego_w = windows(objs, "dist_from_ego", frames)
 
     mask = (
         np.all(~(ped_crossing_w > 0), axis=1)  # not on pedestrian crossing
@@ -585,13 +538,8 @@ def is_running(objs: List[Agent], frames: int = 6):
     if len(objs) < frames or not objs[0].is_human:
         return (None, None)
 
-    vel = np.array([o.velocity for o in objs])
-    dist_from_ego = np.array([o.dist_from_ego for o in objs])
-
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
-    dist_from_ego_w = np.lib.stride_tricks.sliding_window_view(
-        dist_from_ego, frames, axis=0
-    )
+    vel_w = windows(objs, "speed", frames)
+    dist_from_ego_w = windows(objs, "dist_from_ego", frames)
 
     mask = (
         (vel_w.min(axis=1) > 2.5)  # walking instead of standing
@@ -608,9 +556,7 @@ def is_standing(objs: List[Agent], frames: int = 6):
     if len(objs) < frames or not objs[0].is_human:
         return (None, None)
 
-    vel = np.array([o.velocity for o in objs])
-
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
+    vel_w = windows(objs, "speed", frames)
 
     mask = (
         vel_w.max(axis=1) < 0.1  # standing
@@ -626,11 +572,8 @@ def is_walking(objs: List[Agent], frames: int = 6):
     if len(objs) < frames or not objs[0].is_human:
         return (None, None)
 
-    vel = np.array([o.velocity for o in objs])
-    walkway = np.array([o.walkway_id for o in objs])
-
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
-    walkway_w = np.lib.stride_tricks.sliding_window_view(walkway, frames, axis=0)
+    vel_w = windows(objs, "speed", frames)
+    walkway_w = windows(objs, "walkway", frames)
 
     mask = (
         np.all(walkway_w > 0, axis=1)  # on a walkway
@@ -648,33 +591,19 @@ def is_agent_walking_alongside(objs: List[Agent], other_objs: List[Agent], frame
     if (len(objs) < frames) or (len(other_objs) < frames):
         return (None, None)
 
-    if isinstance(objs[0], Agent) and not objs[0].is_human:
+    if adu.is_agent(objs) and not objs[0].is_human:
         return (None, None)
 
-    if isinstance(other_objs[0], Agent) and not other_objs[0].is_human:
+    if adu.is_agent(other_objs) and not other_objs[0].is_human:
         return (None, None)
 
-    xy = np.array([o.xy for o in objs])
-    vel = np.array([o.velocity for o in objs])
-    yaw = np.rad2deg(adu.get_yaw(objs))
-
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
-
-    other_xy = np.array([o.xy for o in other_objs])
-    other_vel = np.array([o.velocity for o in other_objs])
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
+    vel_w = windows(objs, "speed", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
 
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_vel_w = np.lib.stride_tricks.sliding_window_view(other_vel, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
+    other_vel_w = windows(other_objs, "speed", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    delta_xy_w = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy_w = pair_windows(objs, other_objs, "delta_xy", frames)
 
     mask = (
         (delta_xy_w.max(axis=-1) < 1.0)  # close to each other
@@ -693,33 +622,19 @@ def is_agent_walking_opposite(objs: List[Agent], other_objs: List[Agent], frames
     if (len(objs) < frames) or (len(other_objs) < frames):
         return (None, None)
 
-    if isinstance(objs[0], Agent) and not objs[0].is_human:
+    if adu.is_agent(objs) and not objs[0].is_human:
         return (None, None)
 
-    if isinstance(other_objs[0], Agent) and not other_objs[0].is_human:
+    if adu.is_agent(other_objs) and not other_objs[0].is_human:
         return (None, None)
 
-    xy = np.array([o.xy for o in objs])
-    vel = np.array([o.velocity for o in objs])
-    yaw = np.rad2deg(adu.get_yaw(objs))
+    vel_w = windows(objs, "speed", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    vel_w = np.lib.stride_tricks.sliding_window_view(vel, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
-
-    other_xy = np.array([o.xy for o in other_objs])
-    other_vel = np.array([o.velocity for o in other_objs])
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
-
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_vel_w = np.lib.stride_tricks.sliding_window_view(other_vel, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
+    other_vel_w = windows(other_objs, "speed", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    delta_xy_w = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy_w = pair_windows(objs, other_objs, "delta_xy", frames)
 
     mask = (
         (delta_xy_w.max(axis=-1) < 5.0)  # close to each other
@@ -748,36 +663,16 @@ def is_agent_stationary_behind_agent(
     if not other_objs[0].is_vehicle:
         return (None, None)
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-    yaw = np.rad2deg(adu.get_yaw(objs))
-
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
-
     # xy in ego
-    xy_in_other = [
-        o.translate_rotate_xyz(-np.array(e.xyz), e.q.inverse)
-        for o, e in zip(objs, other_objs)
-    ]
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
+    v_w = windows(objs, "vel", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
 
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
+    other_v_w = windows(other_objs, "vel", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
 
     mask = (
         np.all(np.abs(xy_in_other_w[..., 1]) < 2.0, axis=1)  # lateral difference small
@@ -806,36 +701,16 @@ def is_agent_stationary_in_front_of_agent(
     if not other_objs[0].is_vehicle:
         return (None, None)
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-    yaw = np.rad2deg(adu.get_yaw(objs))
-
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
-
     # xy in ego
-    xy_in_other = [
-        o.translate_rotate_xyz(-np.array(e.xyz), e.q.inverse)
-        for o, e in zip(objs, other_objs)
-    ]
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
+    v_w = windows(objs, "vel", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
 
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
+    other_v_w = windows(other_objs, "vel", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
 
     mask = (
         np.all(np.abs(xy_in_other_w[..., 1]) < 2.0, axis=1)  # lateral difference small
@@ -864,36 +739,16 @@ def is_agent_stationary_right_of_agent(
     if not other_objs[0].is_vehicle:
         return (None, None)
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-    yaw = np.rad2deg(adu.get_yaw(objs))
-
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
-
     # xy in ego
-    xy_in_other = [
-        o.translate_rotate_xyz(-np.array(e.xyz), e.q.inverse)
-        for o, e in zip(objs, other_objs)
-    ]
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
+    v_w = windows(objs, "vel", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
 
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
+    other_v_w = windows(other_objs, "vel", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
 
     mask = (
         np.all(
@@ -924,36 +779,16 @@ def is_agent_stationary_left_of_agent(
     if not other_objs[0].is_vehicle:
         return (None, None)
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-    yaw = np.rad2deg(adu.get_yaw(objs))
-
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
-
     # xy in ego
-    xy_in_other = [
-        o.translate_rotate_xyz(-np.array(e.xyz), e.q.inverse)
-        for o, e in zip(objs, other_objs)
-    ]
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
+    v_w = windows(objs, "vel", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
 
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
+    other_v_w = windows(other_objs, "vel", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
 
     mask = (
         np.all(
@@ -984,36 +819,16 @@ def is_agent_moving_right_of_agent(
     if not other_objs[0].is_vehicle:
         return (None, None)
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-    yaw = np.rad2deg(adu.get_yaw(objs))
-
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
-
     # xy in ego
-    xy_in_other = [
-        o.translate_rotate_xyz(-np.array(e.xyz), e.q.inverse)
-        for o, e in zip(objs, other_objs)
-    ]
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
+    v_w = windows(objs, "vel", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
 
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
+    other_v_w = windows(other_objs, "vel", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
 
     mask = (
         np.all(
@@ -1044,36 +859,16 @@ def is_agent_moving_left_of_agent(
     if not other_objs[0].is_vehicle:
         return (None, None)
 
-    xy = adu.get_xy(objs)
-    v = adu.get_vel(objs)
-    yaw = np.rad2deg(adu.get_yaw(objs))
+    # xy in ego
 
-    other_xy = adu.get_xy(other_objs)
-    other_v = adu.get_vel(other_objs)
-    other_yaw = np.rad2deg(adu.get_yaw(other_objs))
+    xy_in_other_w = pair_windows(objs, other_objs, "xyz_in_other", frames)
+    v_w = windows(objs, "vel", frames)
+    yaw_w = windows(objs, "yaw_deg", frames)
 
-    # xy in ego
-    xy_in_other = [
-        o.translate_rotate_xyz(-np.array(e.xyz), e.q.inverse)
-        for o, e in zip(objs, other_objs)
-    ]
+    other_v_w = windows(other_objs, "vel", frames)
+    other_yaw_w = windows(other_objs, "yaw_deg", frames)
 
-    xy_w = np.lib.stride_tricks.sliding_window_view(xy, frames, axis=0).transpose(
-        0, 2, 1
-    )
-    xy_in_other_w = np.lib.stride_tricks.sliding_window_view(
-        xy_in_other, frames, axis=0
-    ).transpose(0, 2, 1)
-    v_w = np.lib.stride_tricks.sliding_window_view(v, frames, axis=0)
-    yaw_w = np.lib.stride_tricks.sliding_window_view(yaw, frames, axis=0)
-
-    other_xy_w = np.lib.stride_tricks.sliding_window_view(
-        other_xy, frames, axis=0
-    ).transpose(0, 2, 1)
-    other_v_w = np.lib.stride_tricks.sliding_window_view(other_v, frames, axis=0)
-    other_yaw_w = np.lib.stride_tricks.sliding_window_view(other_yaw, frames, axis=0)
-
-    delta_xy = np.linalg.norm(xy_w - other_xy_w, axis=-1)
+    delta_xy = pair_windows(objs, other_objs, "delta_xy", frames)
 
     mask = (
         np.all(
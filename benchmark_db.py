@@ -0,0 +1,155 @@
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.orm import Session
+
+from annotator.data import Base
+from annotator.data.loading import DOWNSAMPLING, EVALUATION, VQA_EXTRACTION
+from annotator.data.maneuvers import Maneuver, PositiveManeuver
+from annotator.data.migrations import migrate
+from annotator.data.models import Agent, Frame, Track
+from annotator.data.trajectories import load_trajectories
+
+
+def mining(session):
+    load_trajectories(session)
+    session.scalars(select(Frame)).all()
+    session.scalars(select(Track)).all()
+
+
+def geometry(session):
+    session.scalars(select(Agent.id).where(~Agent.geometry.has())).all()
+
+
+def downsampling(session):
+    session.scalars(select(Maneuver).options(*DOWNSAMPLING)).all()
+    session.scalars(
+        select(Maneuver)
+        .where(Maneuver.in_use == True)
+        .where(Maneuver.pos_maneuvers.any(PositiveManeuver.type == 0))
+        .options(*DOWNSAMPLING)
+    ).all()
+
+
+def verification(session):
+    session.scalars(
+        select(Maneuver)
+        .where(Maneuver.manually_labeled == False)
+        .where(Maneuver.in_use == False)
+        .outerjoin(PositiveManeuver)
+        .order_by(PositiveManeuver.type)
+        .options(*VQA_EXTRACTION)
+    ).all()
+
+
+def vqa_extraction(session):
+    session.scalars(
+        select(Maneuver)
+        .where(
+            Maneuver.manually_labeled == True,
+            Maneuver.in_use == True,
+            Maneuver.pos_maneuvers != None,
+            Maneuver.pos_maneuvers.any(),
+        )
+        .options(*VQA_EXTRACTION)
+    ).all()
+
+
+def evaluation(session):
+    session.scalars(select(Maneuver).options(*EVALUATION)).all()
+
+
+# the read queries of each pipeline stage
+STAGES = {
+    "mining": mining,
+    "geometry": geometry,
+    "downsampling": downsampling,
+    "verification": verification,
+    "vqa_extraction": vqa_extraction,
+    "evaluation": evaluation,
+}
+
+
+def drop_indexes(engine):
+    """
+    Drop every secondary index declared on the models, the schema before any index was added
+    declared none.
+    :param engine: Engine of the database.
+    :return: Names of the dropped indexes and of the kept ones, which are not declared on the models.
+    """
+    dropped, kept = [], []
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {i["name"] for i in inspect(connection).get_indexes(table.name)}
+            declared = {index.name for index in table.indexes}
+            for index in table.indexes:
+                if index.name in existing:
+                    index.drop(connection)
+                    dropped.append(index.name)
+            kept.extend(sorted(existing - declared))
+        connection.execute(text("ANALYZE"))
+    return dropped, kept
+
+
+def time_stages(engine, repeat: int):
+    """
+    Time the queries of every stage, including loading the rows into ORM objects.
+    :param engine: Engine of the database.
+    :param repeat: Number of runs per stage, the fastest one is reported.
+    :return: Seconds per stage.
+    """
+    timings = {}
+    for name, stage in STAGES.items():
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with Session(engine) as session:
+                stage(session)
+            runs.append(time.perf_counter() - start)
+        timings[name] = min(runs)
+    return timings
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        timings = {}
+        for variant in ("before", "after"):
+            db_path = Path(tmp_dir) / f"{variant}.db"
+            shutil.copy(args.db_path.name, db_path)
+            engine = create_engine(f"sqlite:///{str(db_path)}", echo=False)
+            migrate(engine)
+            if variant == "before":
+                dropped, kept = drop_indexes(engine)
+            timings[variant] = time_stages(engine, args.repeat)
+            engine.dispose()
+
+    print(
+        f"before: {len(dropped)} declared indexes dropped, kept: {', '.join(kept) or 'none'}"
+    )
+    print(f"{'stage':<16}{'before':>10}{'after':>10}{'speedup':>10}")
+    for name in STAGES:
+        before, after = timings["before"][name], timings["after"][name]
+        print(f"{name:<16}{before:>9.3f}s{after:>9.3f}s{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the queries of each pipeline stage without and with the indexes"
+    )
+    parser.add_argument(
+        "--db_path",
+        type=Path,
+        default="nuScenes.db",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+    )
+    args = parser.parse_args()
+
+    main(args)
@@ -8,11 +8,13 @@ import numpy as np
 import fpsample
 
 from annotator.data.models import Frame, VisibilityType
+from annotator.data.loading import DOWNSAMPLING
+from annotator.data.migrations import migrate
 from annotator.data.maneuvers import Maneuver, PositiveManeuver, ManeuverType
 
 
 def downsample_mans(session, max_nb_samples=50, d_threshold=30.0):
-    stmt = select(Maneuver)
+    stmt = select(Maneuver).options(*DOWNSAMPLING)
     maneuvers = session.scalars(stmt).all()
 
     for man in maneuvers:
@@ -46,6 +48,7 @@ def downsample_mans(session, max_nb_samples=50, d_threshold=30.0):
             select(Maneuver)
             .where(Maneuver.in_use == True)
             .where(Maneuver.pos_maneuvers.any(PositiveManeuver.type == maneuver_type))
+            .options(*DOWNSAMPLING)
         )
         maneuvers = session.scalars(stmt).all()
         maneuvers = [
@@ -67,6 +70,7 @@ def downsample_mans(session, max_nb_samples=50, d_threshold=30.0):
 
 def main(args):
     engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
     session = Session(engine)
 
     downsample_mans(session)
@@ -7,6 +7,8 @@ from sqlalchemy.orm import Session
 
 from annotator.data.maneuvers import Maneuver, ManeuverType
 from annotator.data.models import Frame
+from annotator.data.loading import EVALUATION
+from annotator.data.migrations import migrate
 
 from .consts import PredictionKeys, ResultKeys
 
@@ -27,6 +29,7 @@ def evaluate(args):
         answers = json.load(f)
 
     engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
     session = Session(engine)
 
     results = {
@@ -35,11 +38,15 @@ def evaluate(args):
         ResultKeys.AGENT: {},
         ResultKeys.AGENT_AGENT: {},
     }
-    stmt = select(Maneuver).where(
-        Maneuver.manually_labeled,
-        Maneuver.in_use,
-        Maneuver.pos_maneuvers != None,
-        Maneuver.pos_maneuvers.any(),
+    stmt = (
+        select(Maneuver)
+        .where(
+            Maneuver.manually_labeled,
+            Maneuver.in_use,
+            Maneuver.pos_maneuvers != None,
+            Maneuver.pos_maneuvers.any(),
+        )
+        .options(*EVALUATION)
     )
     mans = session.scalars(stmt).all()
     for man in mans:
@@ -0,0 +1,32 @@
+import argparse
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from annotator.data.trajectories import export_trajectories
+
+
+def main(args):
+    engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    session = Session(engine)
+
+    export_trajectories(session, args.out_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="STSBench Annotator")
+    parser.add_argument(
+        "--db_path",
+        type=Path,
+        default="nuScenes.db",
+    )
+    parser.add_argument(
+        "--out_dir",
+        help="Output folder with one .npy file per column",
+        type=Path,
+        default=Path("trajectories"),
+    )
+    args = parser.parse_args()
+
+    main(args)
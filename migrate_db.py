@@ -0,0 +1,26 @@
+import argparse
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from annotator.data.geometry import compute_agent_geometry
+from annotator.data.migrations import migrate
+
+
+def main(args):
+    engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
+    compute_agent_geometry(Session(engine))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="STSBench Annotator")
+    parser.add_argument(
+        "--db_path",
+        type=Path,
+        default="nuScenes.db",
+    )
+    args = parser.parse_args()
+
+    main(args)
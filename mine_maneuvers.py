@@ -1,14 +1,20 @@
 import argparse
+import multiprocessing
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func, insert
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 import numpy as np
 from tqdm import tqdm
 
-from annotator.data.models import Base, Scene, Frame, Agent, Ego, Track
+from annotator.data import frame_maneuver, agent_maneuver
+from annotator.data.models import Agent
+from annotator.data.trajectories import Trajectory, TrajectoryStore
+import annotator.data.utils as adu
+from annotator.data.migrations import migrate
 from annotator.data.maneuvers import (
     ManeuverType,
     PositiveManeuver,
@@ -86,273 +92,416 @@ MINE_FUNC = {
 }
 
 
-def mine_ego_maneuver(frames: List[Frame], maneuver_type: ManeuverType):
-    egos = [f.ego for f in frames]
+EGO_MANEUVERS = [
+    ManeuverType.ACCELERATE,
+    ManeuverType.DECELERATE,
+    ManeuverType.STOP,
+    ManeuverType.LEFT_TURN,
+    ManeuverType.RIGHT_TURN,
+    ManeuverType.U_TURN,
+    ManeuverType.REVERSE,
+    ManeuverType.LANE_CHANGE,
+]
+
+EGO_AGENT_MANEUVERS = [
+    ManeuverType.OVERTAKE_AGENT,
+    ManeuverType.WAIT_PED_CROSS,
+    ManeuverType.FOLLOW_AGENT,
+    ManeuverType.LEAD_AGENT,
+    ManeuverType.PASS_AGENT,
+    ManeuverType.STATIONARY_BEHIND_AGENT,
+    ManeuverType.STATIONARY_IN_FRONT_OF_AGENT,
+    ManeuverType.STATIONARY_LEFT_OF_AGENT,
+    ManeuverType.STATIONARY_RIGHT_OF_AGENT,
+    ManeuverType.MOVING_RIGHT_OF_AGENT,
+    ManeuverType.MOVING_LEFT_OF_AGENT,
+]
+
+AGENT_MANEUVERS = [
+    ManeuverType.ACCELERATE,
+    ManeuverType.STOP,
+    ManeuverType.LEFT_TURN,
+    ManeuverType.RIGHT_TURN,
+    ManeuverType.U_TURN,
+    ManeuverType.REVERSE,
+    ManeuverType.LANE_CHANGE,
+    ManeuverType.CROSS,
+    ManeuverType.JAYWALK,
+    ManeuverType.RUN,
+    ManeuverType.STAND,
+    ManeuverType.WALK,
+]
+
+AGENT_AGENT_MANEUVERS = [
+    ManeuverType.OVERTAKE_AGENT,
+    ManeuverType.WAIT_PED_CROSS,
+    ManeuverType.FOLLOW_AGENT,
+    ManeuverType.LEAD_AGENT,
+    ManeuverType.WALK_ALONGSIDE,
+    ManeuverType.WALK_OPPOSITE,
+    ManeuverType.PASS_AGENT,
+    ManeuverType.STATIONARY_BEHIND_AGENT,
+    ManeuverType.STATIONARY_IN_FRONT_OF_AGENT,
+    ManeuverType.STATIONARY_RIGHT_OF_AGENT,
+    ManeuverType.STATIONARY_LEFT_OF_AGENT,
+    ManeuverType.MOVING_RIGHT_OF_AGENT,
+    ManeuverType.MOVING_LEFT_OF_AGENT,
+]
+
+AGENT_EGO_MANEUVERS = [
+    ManeuverType.OVERTAKE_EGO,
+    ManeuverType.PASS_EGO,
+    ManeuverType.FOLLOW_EGO,
+    ManeuverType.LEAD_EGO,
+    ManeuverType.STATIONARY_BEHIND_EGO,
+    ManeuverType.STATIONARY_IN_FRONT_OF_EGO,
+    ManeuverType.STATIONARY_RIGHT_OF_EGO,
+    ManeuverType.STATIONARY_LEFT_OF_EGO,
+    ManeuverType.MOVING_RIGHT_OF_EGO,
+    ManeuverType.MOVING_LEFT_OF_EGO,
+]
+
+
+# largest distance between the two trajectories any pairwise predicate accepts, i.e. following
+# and leading
+MAX_PAIR_DISTANCE = 20.0
+
+
+def can_interact(trajectory: Trajectory, other: Trajectory) -> bool:
+    """
+    Whether any pairwise predicate accepts the categories of the two trajectories:
+    vehicle and vehicle, human and human or a vehicle waiting for a crossing human.
+    """
+    if trajectory.is_human:
+        return other.is_human
+    return trajectory.is_vehicle and (other.is_vehicle or other.is_human)
+
+
+def mined_maneuver(
+    maneuver_type: ManeuverType,
+    frame_ids: np.ndarray,
+    negatives: List[ManeuverType],
+    track_id: int | None = None,
+    other_agent_ids: np.ndarray | None = None,
+) -> Dict:
+    """
+    Plain record of a mined maneuver, turned into rows by `write_maneuvers`.
+    :param maneuver_type: The mined (positive) maneuver.
+    :param frame_ids: Frames of the maneuver.
+    :param negatives: Prelabeled negative maneuvers.
+    :param track_id: Track of the agent, None for ego maneuvers.
+    :param other_agent_ids: Agents of the other track in the same frames, if any.
+    """
+    return dict(
+        type=maneuver_type,
+        frame_ids=frame_ids.tolist(),
+        prelabeled_negatives=list(negatives),
+        negatives=list(negatives),
+        track_id=track_id,
+        other_agent_ids=[] if other_agent_ids is None else other_agent_ids.tolist(),
+    )
+
+
+def mine_ego_maneuver(egos: Trajectory, maneuver_type: ManeuverType):
     for start_idx, end_idx in MINE_FUNC[maneuver_type](egos):
         if start_idx is None or end_idx is None:
             continue
-        poss = [PositiveManeuver(type=maneuver_type)]
-        negs = [NegativeManeuver(type=man) for man in NEGATIVE_MANEUVERS[maneuver_type]]
-        yield Maneuver(
-            frames=frames[start_idx:end_idx],
-            manually_labeled=False,
-            labeling_time=-1,
-            in_use=True,
-            pos_maneuvers=poss,
-            prelabeled_pos_maneuvers=[p.type for p in poss],
-            neg_maneuvers=negs,
-            prelabeled_neg_maneuvers=[n.type for n in negs],
-            is_ego=True,
-            is_agent=False,
+        yield mined_maneuver(
+            maneuver_type,
+            egos.frame_id[start_idx:end_idx],
+            NEGATIVE_MANEUVERS[maneuver_type],
         )
 
 
-def mine_ego_agent_maneuver(scene: Scene, session, maneuver_type: ManeuverType):
-    stmt = select(Track).where(Track.scene_id == scene.id)
-    other_tracks = session.scalars(stmt).all()
-
-    for other_track in other_tracks:
-        agents, egos = other_track.get_synchronized_ego()
-        for start_idx, end_idx in MINE_FUNC[maneuver_type](egos, agents):
+def mine_ego_agent_maneuver(
+    pairs: List[Tuple[Trajectory, Trajectory]],
+    maneuver_type: ManeuverType,
+):
+    """
+    :param pairs: Synchronized egos and agents of the tracks from the same scene.
+    """
+    for track_egos, agents in pairs:
+        for start_idx, end_idx in MINE_FUNC[maneuver_type](track_egos, agents):
             if start_idx is None or end_idx is None:
                 continue
-            poss = [PositiveManeuver(type=maneuver_type)]
-            negs = [
-                NegativeManeuver(type=man) for man in NEGATIVE_MANEUVERS[maneuver_type]
-            ]
-            yield Maneuver(
-                frames=[e.frame for e in egos[start_idx:end_idx]],
-                other_agents=agents[start_idx:end_idx],
-                manually_labeled=False,
-                labeling_time=-1,
-                in_use=True,
-                pos_maneuvers=poss,
-                prelabeled_pos_maneuvers=[p.type for p in poss],
-                neg_maneuvers=negs,
-                prelabeled_neg_maneuvers=[n.type for n in negs],
-                is_ego=True,
-                is_agent=False,
+            yield mined_maneuver(
+                maneuver_type,
+                track_egos.frame_id[start_idx:end_idx],
+                NEGATIVE_MANEUVERS[maneuver_type],
+                other_agent_ids=agents.id[start_idx:end_idx],
             )
 
 
-def mine_agent_maneuver(track: Track, maneuver_type: ManeuverType):
-    for start_idx, end_idx in MINE_FUNC[maneuver_type](track.agents):
+def mine_agent_maneuver(
+    track_id: int,
+    agents: Trajectory,
+    maneuver_type: ManeuverType,
+):
+    for start_idx, end_idx in MINE_FUNC[maneuver_type](agents):
         if start_idx is None or end_idx is None:
             continue
-        poss = [PositiveManeuver(type=maneuver_type)]
-        negs = [NegativeManeuver(type=man) for man in NEGATIVE_MANEUVERS[maneuver_type]]
-        frames = [a.frame for a in track.agents[start_idx:end_idx]]
-        yield Maneuver(
-            frames=frames,
-            instance_token=track.instance_token,
-            manually_labeled=False,
-            labeling_time=-1,
-            in_use=True,
-            pos_maneuvers=poss,
-            prelabeled_pos_maneuvers=[p.type for p in poss],
-            neg_maneuvers=negs,
-            prelabeled_neg_maneuvers=[n.type for n in negs],
-            is_ego=False,
-            is_agent=True,
+        maneuver = mined_maneuver(
+            maneuver_type,
+            agents.frame_id[start_idx:end_idx],
+            NEGATIVE_MANEUVERS[maneuver_type],
+            track_id=track_id,
         )
-
-
-def mine_agent_agent_maneuver(track: Track, session, maneuver_type: ManeuverType):
-    # get tracks from the same scene
-    stmt = select(Track).where(Track.scene_id == track.scene_id)
-    other_tracks = session.scalars(stmt).all()
-
-    for other_track in other_tracks:
-        if track.id == other_track.id:
-            continue
-
-        cur_agents, other_agents = track.get_synchronized_agents(other_track)
+        yield mine_negs_agent(maneuver, agents[start_idx:end_idx])
+
+
+def mine_agent_agent_maneuver(
+    track_id: int,
+    pairs: List[Tuple[Trajectory, Trajectory]],
+    maneuver_type: ManeuverType,
+):
+    """
+    :param pairs: Synchronized agents of the track and of other tracks from the same scene.
+    """
+    for cur_agents, other_agents in pairs:
         for start_idx, end_idx in MINE_FUNC[maneuver_type](cur_agents, other_agents):
             if start_idx is None or end_idx is None:
                 continue
-            poss = [PositiveManeuver(type=maneuver_type)]
 
             # override "standard" negative maneuvers with pedestrian-specific
             negative_maneuver = NEGATIVE_MANEUVERS
             if (
-                cur_agents[0].is_human
-                and other_agents[0].is_human
+                cur_agents.is_human
+                and other_agents.is_human
                 and maneuver_type in PED_NEGATIVE_MANEUVERS.keys()
             ):
                 negative_maneuver = PED_NEGATIVE_MANEUVERS
 
-            negs = [
-                NegativeManeuver(type=man) for man in negative_maneuver[maneuver_type]
-            ]
-
-            yield Maneuver(
-                frames=[a.frame for a in cur_agents[start_idx:end_idx]],
-                instance_token=track.instance_token,
-                other_agents=other_agents[start_idx:end_idx],
-                manually_labeled=False,
-                labeling_time=-1,
-                in_use=True,
-                pos_maneuvers=poss,
-                prelabeled_pos_maneuvers=[p.type for p in poss],
-                neg_maneuvers=negs,
-                prelabeled_neg_maneuvers=[n.type for n in negs],
-                is_ego=False,
-                is_agent=True,
+            maneuver = mined_maneuver(
+                maneuver_type,
+                cur_agents.frame_id[start_idx:end_idx],
+                negative_maneuver[maneuver_type],
+                track_id=track_id,
+                other_agent_ids=other_agents.id[start_idx:end_idx],
             )
-
-
-def mine_agent_ego_maneuver(track: Track, maneuver_type: ManeuverType):
-    agents, egos = track.get_synchronized_ego()
+            yield mine_negs_agent(maneuver, cur_agents[start_idx:end_idx])
+
+
+def mine_agent_ego_maneuver(
+    track_id: int,
+    agents: Trajectory,
+    egos: Trajectory,
+    maneuver_type: ManeuverType,
+):
+    """
+    :param agents: Agents of the track, synchronized with egos.
+    """
     for start_idx, end_idx in MINE_FUNC[maneuver_type](agents, egos):
         if start_idx is None or end_idx is None:
             continue
-        poss = [PositiveManeuver(type=maneuver_type)]
-        negs = [NegativeManeuver(type=man) for man in NEGATIVE_MANEUVERS[maneuver_type]]
-        yield Maneuver(
-            frames=[a.frame for a in agents[start_idx:end_idx]],
-            instance_token=track.instance_token,
-            manually_labeled=False,
-            labeling_time=-1,
-            in_use=True,
-            pos_maneuvers=poss,
-            prelabeled_pos_maneuvers=[p.type for p in poss],
-            neg_maneuvers=negs,
-            prelabeled_neg_maneuvers=[n.type for n in negs],
-            is_ego=False,
-            is_agent=True,
+        yield mined_maneuver(
+            maneuver_type,
+            agents.frame_id[start_idx:end_idx],
+            NEGATIVE_MANEUVERS[maneuver_type],
+            track_id=track_id,
         )
 
 
-def mine_ego(args):
-    engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
-    Base.metadata.create_all(engine)
-    session = Session(engine)
-
-    stmt = select(Scene)
-    scenes = session.scalars(stmt).all()
-
-    for scene in tqdm(scenes):
-        maneuver_types = [
-            ManeuverType.ACCELERATE,
-            ManeuverType.DECELERATE,
-            ManeuverType.STOP,
-            ManeuverType.LEFT_TURN,
-            ManeuverType.RIGHT_TURN,
-            ManeuverType.U_TURN,
-            ManeuverType.REVERSE,
-            ManeuverType.LANE_CHANGE,
-        ]
-        for maneuver_type in maneuver_types:
-            for maneuver in mine_ego_maneuver(scene.frames, maneuver_type):
-                session.add(maneuver)
-            session.commit()
-
-        maneuver_types = [
-            ManeuverType.OVERTAKE_AGENT,
-            ManeuverType.WAIT_PED_CROSS,
-            ManeuverType.FOLLOW_AGENT,
-            ManeuverType.LEAD_AGENT,
-            ManeuverType.PASS_AGENT,
-            ManeuverType.STATIONARY_BEHIND_AGENT,
-            ManeuverType.STATIONARY_IN_FRONT_OF_AGENT,
-            ManeuverType.STATIONARY_LEFT_OF_AGENT,
-            ManeuverType.STATIONARY_RIGHT_OF_AGENT,
-            ManeuverType.MOVING_RIGHT_OF_AGENT,
-            ManeuverType.MOVING_LEFT_OF_AGENT,
-        ]
-        for maneuver_type in maneuver_types:
-            for maneuver in mine_ego_agent_maneuver(scene, session, maneuver_type):
-                session.add(maneuver)
-            session.commit()
-
-
-def mine_negs_agent(man: Maneuver):
+def mine_negs_agent(man: Dict, agents: List[Agent] | Trajectory):
+    """
+    :param man: Mined agent maneuver, see `mined_maneuver`.
+    :param agents: The agents of the maneuver.
+    """
     # for human objects, distinguishing between run, walk, and stand is straightforward.
-    if not man.is_human:
+    if not agents[0].is_human:
         return man
 
-    vel = [a.velocity for a in man.agents]
+    vel = adu.get_speed(agents)
     med_vel = np.median(vel)
 
+    to_remove = None
     if med_vel > 1.66:
-        man.remove_negative(ManeuverType.RUN)
+        to_remove = ManeuverType.RUN
     elif 1.66 >= med_vel >= 0.5:
-        man.remove_negative(ManeuverType.WALK)
+        to_remove = ManeuverType.WALK
     elif med_vel < 0.5:
-        man.remove_negative(ManeuverType.STAND)
+        to_remove = ManeuverType.STAND
+    if to_remove in man["negatives"]:
+        man["negatives"].remove(to_remove)
 
     return man
 
 
-def mine_agent(args):
-    engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
-    Base.metadata.create_all(engine)
-    session = Session(engine)
+def mine_scene_ego(store: TrajectoryStore, scene_id: int) -> List[Dict]:
+    """
+    Ego maneuvers of a scene, alone and with respect to the agents of the scene.
+    """
+    egos = store.ego(scene_id)
+    # the agents that ever come close enough to the ego, synchronized once for all predicates
+    pairs = []
+    for track_id in store.track_ids(scene_id).tolist():
+        agents = store.track(track_id)
+        if can_interact(egos, agents) and np.any(
+            agents.dist_from_ego <= MAX_PAIR_DISTANCE
+        ):
+            idx, ego_idx = adu.synchronize(agents, egos)
+            pairs.append((egos[ego_idx], agents[idx]))
+
+    maneuvers = []
+    for maneuver_type in EGO_MANEUVERS:
+        maneuvers.extend(mine_ego_maneuver(egos, maneuver_type))
+    for maneuver_type in EGO_AGENT_MANEUVERS:
+        maneuvers.extend(mine_ego_agent_maneuver(pairs, maneuver_type))
+    return maneuvers
+
+
+def mine_scene_agents(store: TrajectoryStore, scene_id: int) -> List[Dict]:
+    """
+    Maneuvers of every agent track of a scene, alone and with respect to the other agents
+    and the ego.
+    """
+    egos = store.ego(scene_id)
+    close_tracks = store.close_tracks(scene_id, MAX_PAIR_DISTANCE)
+
+    maneuvers = []
+    for track_id in store.track_ids(scene_id).tolist():
+        agents = store.track(track_id)
+        assert np.all(np.diff(agents.timestamp) > 0), "Data is not timestamp-sorted"
+        for maneuver_type in AGENT_MANEUVERS:
+            maneuvers.extend(mine_agent_maneuver(track_id, agents, maneuver_type))
+
+        # only pairs that ever come close enough, with categories some predicate accepts,
+        # synchronized once for all predicates
+        pairs = []
+        for other_track_id in close_tracks[track_id].tolist():
+            other_agents = store.track(other_track_id)
+            if can_interact(agents, other_agents):
+                idx, other_idx = adu.synchronize(agents, other_agents)
+                pairs.append((agents[idx], other_agents[other_idx]))
+        for maneuver_type in AGENT_AGENT_MANEUVERS:
+            maneuvers.extend(mine_agent_agent_maneuver(track_id, pairs, maneuver_type))
+
+        if not can_interact(agents, egos) or not np.any(
+            agents.dist_from_ego <= MAX_PAIR_DISTANCE
+        ):
+            continue
+        idx, ego_idx = adu.synchronize(agents, egos)
+        for maneuver_type in AGENT_EGO_MANEUVERS:
+            maneuvers.extend(
+                mine_agent_ego_maneuver(
+                    track_id, agents[idx], egos[ego_idx], maneuver_type
+                )
+            )
+    return maneuvers
 
-    stmt = select(Track)
-    tracks = session.scalars(stmt).all()
 
-    for track in tqdm(tracks):
-        assert np.all(np.diff([a.frame.timestamp for a in track.agents]) > 0), (
-            "Data is not timestamp-sorted"
+WRITE_TABLES = [
+    Maneuver,
+    PositiveManeuver,
+    NegativeManeuver,
+    frame_maneuver,
+    agent_maneuver,
+]
+
+
+def write_maneuvers(conn, maneuvers: List[Dict], instance_tokens: Dict, next_id: int):
+    """
+    Insert mined maneuvers with one executemany INSERT per table.
+    :param conn: Connection with an open transaction.
+    :param maneuvers: Records of `mined_maneuver`.
+    :param instance_tokens: Instance token by track id.
+    :param next_id: First free maneuver id.
+    :return: Next free maneuver id.
+    """
+    rows = {table: [] for table in WRITE_TABLES}
+    for maneuver_id, maneuver in enumerate(maneuvers, next_id):
+        track_id = maneuver["track_id"]
+        rows[Maneuver].append(
+            dict(
+                id=maneuver_id,
+                manually_labeled=False,
+                labeling_time=-1,
+                in_use=True,
+                prelabeled_pos_maneuvers=[maneuver["type"]],
+                prelabeled_neg_maneuvers=maneuver["prelabeled_negatives"],
+                instance_token=instance_tokens.get(track_id),
+                track_id=track_id,
+                is_ego=track_id is None,
+                is_agent=track_id is not None,
+            )
+        )
+        rows[PositiveManeuver].append(
+            dict(type=maneuver["type"], maneuver_id=maneuver_id)
+        )
+        rows[NegativeManeuver].extend(
+            dict(type=negative, maneuver_id=maneuver_id)
+            for negative in maneuver["negatives"]
+        )
+        rows[frame_maneuver].extend(
+            dict(frame_id=frame_id, maneuver=maneuver_id)
+            for frame_id in maneuver["frame_ids"]
         )
-        maneuver_types = [
-            ManeuverType.ACCELERATE,
-            ManeuverType.STOP,
-            ManeuverType.LEFT_TURN,
-            ManeuverType.RIGHT_TURN,
-            ManeuverType.U_TURN,
-            ManeuverType.REVERSE,
-            ManeuverType.LANE_CHANGE,
-            ManeuverType.CROSS,
-            ManeuverType.JAYWALK,
-            ManeuverType.RUN,
-            ManeuverType.STAND,
-            ManeuverType.WALK,
-        ]
-        for maneuver_type in maneuver_types:
-            for maneuver in mine_agent_maneuver(track, maneuver_type):
-                session.add(maneuver)
-                maneuver = mine_negs_agent(maneuver)
-            session.commit()
-
-        maneuver_types = [
-            ManeuverType.OVERTAKE_AGENT,
-            ManeuverType.WAIT_PED_CROSS,
-            ManeuverType.FOLLOW_AGENT,
-            ManeuverType.LEAD_AGENT,
-            ManeuverType.WALK_ALONGSIDE,
-            ManeuverType.WALK_OPPOSITE,
-            ManeuverType.PASS_AGENT,
-            ManeuverType.STATIONARY_BEHIND_AGENT,
-            ManeuverType.STATIONARY_IN_FRONT_OF_AGENT,
-            ManeuverType.STATIONARY_RIGHT_OF_AGENT,
-            ManeuverType.STATIONARY_LEFT_OF_AGENT,
-            ManeuverType.MOVING_RIGHT_OF_AGENT,
-            ManeuverType.MOVING_LEFT_OF_AGENT,
-        ]
-        for maneuver_type in maneuver_types:
-            for maneuver in mine_agent_agent_maneuver(track, session, maneuver_type):
-                session.add(maneuver)
-                maneuver = mine_negs_agent(maneuver)
-            session.commit()
-
-        maneuver_types = [
-            ManeuverType.OVERTAKE_EGO,
-            ManeuverType.PASS_EGO,
-            ManeuverType.FOLLOW_EGO,
-            ManeuverType.LEAD_EGO,
-            ManeuverType.STATIONARY_BEHIND_EGO,
-            ManeuverType.STATIONARY_IN_FRONT_OF_EGO,
-            ManeuverType.STATIONARY_RIGHT_OF_EGO,
-            ManeuverType.STATIONARY_LEFT_OF_EGO,
-            ManeuverType.MOVING_RIGHT_OF_EGO,
-            ManeuverType.MOVING_LEFT_OF_EGO,
-        ]
-        for maneuver_type in maneuver_types:
-            for maneuver in mine_agent_ego_maneuver(track, maneuver_type):
-                session.add(maneuver)
-            session.commit()
+        rows[agent_maneuver].extend(
+            dict(agent_id=agent_id, maneuver=maneuver_id)
+            for agent_id in maneuver["other_agent_ids"]
+        )
+
+    for table in WRITE_TABLES:
+        if len(rows[table]) > 0:
+            conn.execute(insert(table), rows[table])
+    return next_id + len(maneuvers)
+
+
+# state inherited by forked mining workers
+_worker_store = None
+
+
+def _mine_scene_worker(mine_scene, scene_id):
+    return mine_scene(_worker_store, scene_id)
+
+
+def mine_scenes(engine, store: TrajectoryStore, mine_scene, workers: int = 1):
+    """
+    Run `mine_scene` on every scene and write the mined maneuvers, one transaction per scene.
+    With `workers` > 1 the scenes are mined in a process pool and written by this process.
+    """
+    global _worker_store
+
+    scene_ids = store.scene_ids().tolist()
+    instance_tokens = dict(
+        zip(store.track_ids().tolist(), store.arrays["track_instance_token"].tolist())
+    )
+    with engine.connect() as conn:
+        next_id = (conn.execute(select(func.max(Maneuver.id))).scalar() or 0) + 1
+
+    pool = None
+    if workers > 1:
+        # fork so the workers share the loaded columns instead of reloading them
+        _worker_store = store
+        pool = multiprocessing.get_context("fork").Pool(workers)
+        # imap keeps the scene order, ids are the same as in a serial run
+        scene_maneuvers = pool.imap(partial(_mine_scene_worker, mine_scene), scene_ids)
+    else:
+        scene_maneuvers = (mine_scene(store, scene_id) for scene_id in scene_ids)
+
+    try:
+        for maneuvers in tqdm(scene_maneuvers, total=len(scene_ids)):
+            with engine.begin() as conn:
+                next_id = write_maneuvers(conn, maneuvers, instance_tokens, next_id)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            _worker_store = None
+
+
+def mine_ego(args):
+    engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
+    with Session(engine) as session:
+        store = TrajectoryStore.from_session(session)
+    mine_scenes(engine, store, mine_scene_ego, args.workers)
+
+
+def mine_agent(args):
+    engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
+    with Session(engine) as session:
+        store = TrajectoryStore.from_session(session)
+    mine_scenes(engine, store, mine_scene_agents, args.workers)
 
 
 if __name__ == "__main__":
@@ -364,6 +513,12 @@ if __name__ == "__main__":
         type=Path,
         default="nuScenes.db",
     )
+    parser.add_argument(
+        "--workers",
+        help="number of processes mining scenes in parallel",
+        default=1,
+        type=int,
+    )
     args = parser.parse_args()
 
     mine_ego(args)
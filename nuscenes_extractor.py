@@ -1,14 +1,25 @@
 import argparse
+from contextlib import contextmanager
 from pathlib import Path
-from functools import partial
+from functools import partial, lru_cache
 import math
+import multiprocessing
 
 from nuscenes.nuscenes import NuScenes
 from nuscenes.utils import splits
 from nuscenes.map_expansion.map_api import NuScenesMap
 from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy import func
+from sqlalchemy import insert
 from sqlalchemy import select
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+import numpy as np
+import shapely
+from shapely.geometry import Point
+from shapely.prepared import prep
+from shapely.strtree import STRtree
 from tqdm import tqdm
 
 from annotator.data.models import (
@@ -23,11 +34,17 @@ from annotator.data.models import (
     Sensor,
     SensorType,
 )
+from annotator.data import agent_map, ego_map_association_table
 from annotator.data.maneuvers import Maneuver
 import annotator.data.utils as adu
+from annotator.data.geometry import compute_agent_geometry
 
 
 def map_extractor(nusc_map, session):
+    """
+    Store the map layers of all locations.
+    :return: Cache from map token to `Map` id.
+    """
     from nuscenes.map_expansion.map_api import locations
 
     all_db_maps = []
@@ -62,10 +79,27 @@ def map_extractor(nusc_map, session):
             all_db_maps.append(db_map)
 
     session.add_all(all_db_maps)
+    session.flush()
+    map_ids = {db_map.token: db_map.id for db_map in all_db_maps}
     session.commit()
 
+    return map_ids
 
-def scene_extractor(nusc, nusc_map, scenes, session):
+
+def load_map_ids(session):
+    """
+    Cache from map token to `Map` id for an already extracted database.
+    """
+    return dict(session.execute(select(Map.token, Map.id)).all())
+
+
+def scene_extractor(nusc, map_index, map_ids, scenes, session):
+    """
+    Store the frames, sensors, ego poses, tracks and agents of the given scenes.
+    Every scene is committed at once, a stored scene is always complete.
+    Map layers are looked up once per scene with `map_index(map_name=...)`,
+    which should return a cached `MapLayerIndex`.
+    """
     pbar = tqdm(total=len(scenes))
 
     for scene in nusc.scene:
@@ -75,11 +109,12 @@ def scene_extractor(nusc, nusc_map, scenes, session):
         pbar.update(1)
 
         map_name = nusc.get("log", scene["log_token"])["location"]
-        curr_nusc_map = nusc_map(map_name=map_name)
 
         db_scene = Scene(
             scene_token=scene["token"], name=scene["name"], location=map_name
         )
+        db_tracks = {}  # instance_token -> Track
+        ego_xy, agent_xy = [], []  # (orm object, x, y), classified once per scene
 
         cur_sample_token = scene["first_sample_token"]
         last_sample_token = scene["last_sample_token"]
@@ -139,14 +174,11 @@ def scene_extractor(nusc, nusc_map, scenes, session):
                 frame=db_frame,
             )
             session.add(db_ego)
-
-            ego_map_layers = curr_nusc_map.layers_on_point(
-                ego_pose["translation"][0], ego_pose["translation"][1], ["lane"]
-            )
-            if ego_map_layers["lane"] != "":
-                stmt = select(Map).where(Map.token == ego_map_layers["lane"])
-                db_map = session.scalars(stmt).one()
-                db_ego.maps.append(db_map)
+            ego_xy.append((
+                db_ego,
+                ego_pose["translation"][0],
+                ego_pose["translation"][1],
+            ))
 
             # add agents
             for sample_annotation_token in sample["anns"]:
@@ -163,10 +195,10 @@ def scene_extractor(nusc, nusc_map, scenes, session):
 
                 instance_token = sample_annotation["instance_token"]
 
-                stmt = select(Track).where(Track.instance_token == instance_token)
-                db_track = session.scalars(stmt).one_or_none()
+                db_track = db_tracks.get(instance_token)
                 if db_track is None:
                     db_track = Track(instance_token=instance_token, scene=db_scene)
+                    db_tracks[instance_token] = db_track
                     session.add(db_track)
 
                 db_agent = Agent(
@@ -194,48 +226,454 @@ def scene_extractor(nusc, nusc_map, scenes, session):
                     ),
                 )
                 session.add(db_agent)
+                agent_xy.append((db_agent, box.center[0], box.center[1]))
+
+            cur_sample_token = sample["next"]
+            if cur_sample_token == last_sample_token:
+                break
+
+        # add maps
+        curr_map_index = map_index(map_name=map_name)
+        ego_map_layers = curr_map_index.layers_on_points(
+            [(x, y) for _, x, y in ego_xy], ["lane"]
+        )
+        ego_map_rows = [
+            (db_ego, map_ids[token])
+            for (db_ego, _, _), token in zip(ego_xy, ego_map_layers["lane"])
+            if token != ""
+        ]
+
+        map_layers = curr_map_index.layers_on_points([(x, y) for _, x, y in agent_xy])
+        agent_map_rows = [
+            (db_agent, map_ids[map_layers[layer][i]])
+            for i, (db_agent, _, _) in enumerate(agent_xy)
+            for layer in MAP_LAYERS
+            if map_layers[layer][i] != ""
+        ]
+
+        # association rows are written directly, appending to `maps` would
+        # reload every (expired) Map instance
+        session.flush()
+        if len(ego_map_rows) > 0:
+            session.execute(
+                insert(ego_map_association_table),
+                [dict(ego_id=e.id, map_id=i) for e, i in ego_map_rows],
+            )
+        if len(agent_map_rows) > 0:
+            session.execute(
+                insert(agent_map),
+                [dict(agent_id=a.id, map_id=i) for a, i in agent_map_rows],
+            )
+
+        session.commit()
+        # drop the committed scene, memory stays flat with the number of scenes
+        session.expunge_all()
+
+
+@contextmanager
+def sqlite_bulk_pragmas(engine, synchronous="OFF", cache_size_kib=1048576):
+    """
+    Relax SQLite durability for the duration of a bulk build.
+    With synchronous=OFF an OS crash or power loss can corrupt the database, which is only fine
+    for a build from scratch. A resumed build has to keep the existing database intact and should
+    use synchronous=NORMAL, which is safe in WAL mode.
+    :param engine: SQLite engine the build writes to.
+    :param synchronous: SQLite synchronous mode, "OFF" or "NORMAL".
+    :param cache_size_kib: Page cache size per connection in KiB.
+    """
+
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA cache_size=-{cache_size_kib}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    # make sure every pooled connection picks up the pragmas
+    engine.dispose()
+    event.listen(engine, "connect", _set_pragmas)
+    try:
+        yield engine
+    finally:
+        event.remove(engine, "connect", _set_pragmas)
+        engine.dispose()
+        # checkpoint the WAL and go back to the default rollback journal
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=DELETE")
+
+
+MAP_LAYERS = ["lane", "ped_crossing", "drivable_area", "walkway"]
+
+
+class MapLayerIndex:
+    """
+    Batch version of `NuScenesMap.layers_on_point` for the polygon layers of one map location.
+    Candidate polygons come from an STRtree per layer, the containment test and the
+    first-record-wins order are the same as in the nuScenes map API.
+    """
+
+    def __init__(self, nusc_map, layer_names=MAP_LAYERS):
+        self.layers = {}
+        for layer_name in layer_names:
+            tokens, polygons = [], []
+            for record in getattr(nusc_map, layer_name):
+                if layer_name == "drivable_area":
+                    polygon_tokens = record["polygon_tokens"]
+                else:
+                    polygon_tokens = [record["polygon_token"]]
+                for polygon_token in polygon_tokens:
+                    tokens.append(record["token"])
+                    polygons.append(nusc_map.extract_polygon(polygon_token))
+            tree = STRtree(polygons) if len(polygons) > 0 else None
+            self.layers[layer_name] = (
+                tokens,
+                polygons,
+                [prep(polygon) for polygon in polygons],
+                tree,
+            )
 
-                # add maps
-                map_layers = curr_nusc_map.layers_on_point(
-                    box.center[0],
-                    box.center[1],
-                    ["lane", "ped_crossing", "drivable_area", "walkway"],
+    def _first_records(self, layer_name, xy):
+        """
+        Index of the first polygon of the layer every point is on, -1 if there is none.
+        """
+        _, polygons, prepared, tree = self.layers[layer_name]
+        first = np.full(len(xy), -1)
+        if tree is None or len(xy) == 0:
+            return first
+
+        if hasattr(tree, "query_items"):
+            # shapely 1.8 only queries a single geometry at a time
+            for j, (x, y) in enumerate(xy):
+                point = Point(x, y)
+                for i in sorted(tree.query_items(point)):
+                    if prepared[i].contains(point):
+                        first[j] = i
+                        break
+            return first
+
+        # shapely >= 2.0 tests all points against the layer in a single call
+        point_idx, polygon_idx = tree.query(shapely.points(xy), predicate="within")
+        # the lowest polygon index is the first record, as in the nuScenes map API
+        first[:] = len(polygons)
+        np.minimum.at(first, point_idx, polygon_idx)
+        first[first == len(polygons)] = -1
+        return first
+
+    def layers_on_points(self, xy, layer_names=MAP_LAYERS):
+        """
+        Query the records of the given layers every point is on.
+        :param xy: Points as (N, 2) array-like.
+        :param layer_names: The polygon layers to search.
+        :return: {<layer name>: <list of N tokens, '' if no record is found>}
+        """
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        layers_on_points = {}
+        for layer_name in layer_names:
+            tokens = self.layers[layer_name][0]
+            layers_on_points[layer_name] = [
+                tokens[i] if i >= 0 else ""
+                for i in self._first_records(layer_name, xy).tolist()
+            ]
+        return layers_on_points
+
+
+def load_map_index(nusc_map, map_name):
+    return MapLayerIndex(nusc_map(map_name=map_name))
+
+
+BULK_TABLES = [
+    Scene.__table__,
+    Frame.__table__,
+    Sensor.__table__,
+    Ego.__table__,
+    Track.__table__,
+    Agent.__table__,
+    ego_map_association_table,
+    agent_map,
+]
+
+# tables whose primary keys are assigned by the bulk extractor
+BULK_ID_TABLES = BULK_TABLES[:6]
+
+
+def extract_scene_rows(nusc, map_index, map_ids, scene):
+    """
+    Build the rows of a single scene as plain dicts, keyed by table name.
+    Primary keys are local to the scene and start at 0, `write_scene_rows` shifts them.
+    """
+    rows = {table.name: [] for table in BULK_TABLES}
+    next_id = {table.name: 0 for table in BULK_ID_TABLES}
+    db_tracks = {}  # instance_token -> track id
+    ego_xy, agent_xy = [], []  # (id, x, y), classified once per scene
+
+    def add_row(table, **row):
+        row["id"] = next_id[table.name]
+        next_id[table.name] += 1
+        rows[table.name].append(row)
+        return row["id"]
+
+    map_name = nusc.get("log", scene["log_token"])["location"]
+
+    scene_id = add_row(
+        Scene.__table__,
+        scene_token=scene["token"],
+        name=scene["name"],
+        location=map_name,
+    )
+
+    cur_sample_token = scene["first_sample_token"]
+    last_sample_token = scene["last_sample_token"]
+    while True:
+        sample = nusc.get("sample", cur_sample_token)
+
+        frame_id = add_row(
+            Frame.__table__, timestamp=sample["timestamp"], scene_id=scene_id
+        )
+
+        # add sensors to the current frame
+        for sensor in SensorType:
+            sensor_data = nusc.get("sample_data", sample["data"][sensor.name])
+            calibrated_sensor = nusc.get(
+                "calibrated_sensor", sensor_data["calibrated_sensor_token"]
+            )
+            intrinsics = dict(
+                fx=None, fy=None, cx=None, cy=None, width=None, height=None
+            )
+            if len(calibrated_sensor["camera_intrinsic"]) > 0:
+                intrinsics = dict(
+                    fx=calibrated_sensor["camera_intrinsic"][0][0],
+                    fy=calibrated_sensor["camera_intrinsic"][1][1],
+                    cx=calibrated_sensor["camera_intrinsic"][0][2],
+                    cy=calibrated_sensor["camera_intrinsic"][1][2],
+                    height=sensor_data["height"],
+                    width=sensor_data["width"],
                 )
-                if map_layers["lane"] != "":
-                    stmt = select(Map).where(Map.token == map_layers["lane"])
-                    db_map = session.scalars(stmt).one()
-                    db_agent.maps.append(db_map)
+            add_row(
+                Sensor.__table__,
+                sensor_token=sensor_data["token"],
+                path=sensor_data["filename"],
+                type=sensor,
+                x=calibrated_sensor["translation"][0],
+                y=calibrated_sensor["translation"][1],
+                z=calibrated_sensor["translation"][2],
+                qw=calibrated_sensor["rotation"][0],
+                qx=calibrated_sensor["rotation"][1],
+                qy=calibrated_sensor["rotation"][2],
+                qz=calibrated_sensor["rotation"][3],
+                frame_id=frame_id,
+                **intrinsics,
+            )
 
-                if map_layers["ped_crossing"] != "":
-                    stmt = select(Map).where(Map.token == map_layers["ped_crossing"])
-                    db_map = session.scalars(stmt).one()
-                    db_agent.maps.append(db_map)
+        # add ego
+        sensor_data = nusc.get("sample_data", sample["data"][SensorType.LIDAR_TOP.name])
+        ego_pose = nusc.get("ego_pose", sensor_data["ego_pose_token"])
+
+        ego_id = add_row(
+            Ego.__table__,
+            ego_pose_token=ego_pose["token"],
+            velocity=None,
+            x=ego_pose["translation"][0],
+            y=ego_pose["translation"][1],
+            z=ego_pose["translation"][2],
+            qw=ego_pose["rotation"][0],
+            qx=ego_pose["rotation"][1],
+            qy=ego_pose["rotation"][2],
+            qz=ego_pose["rotation"][3],
+            frame_id=frame_id,
+        )
 
-                if map_layers["drivable_area"] != "":
-                    stmt = select(Map).where(Map.token == map_layers["drivable_area"])
-                    db_map = session.scalars(stmt).one()
-                    db_agent.maps.append(db_map)
+        ego_xy.append((ego_id, ego_pose["translation"][0], ego_pose["translation"][1]))
 
-                if map_layers["walkway"] != "":
-                    stmt = select(Map).where(Map.token == map_layers["walkway"])
-                    db_map = session.scalars(stmt).one()
-                    db_agent.maps.append(db_map)
+        # add agents
+        for sample_annotation_token in sample["anns"]:
+            sample_annotation = nusc.get("sample_annotation", sample_annotation_token)
 
-            session.commit()
+            category_name = sample_annotation["category_name"]
+            if "vehicle" not in category_name and "human" not in category_name:
+                continue
 
-            cur_sample_token = sample["next"]
-            if cur_sample_token == last_sample_token:
-                break
+            box = nusc.get_box(sample_annotation["token"])
+            box.velocity = nusc.box_velocity(box.token)
 
+            instance_token = sample_annotation["instance_token"]
+            if instance_token not in db_tracks:
+                db_tracks[instance_token] = add_row(
+                    Track.__table__, instance_token=instance_token, scene_id=scene_id
+                )
 
-def compute_ego_vel(session):
-    stmt = select(Scene)
-    scenes = session.scalars(stmt).all()
-    for scene in scenes:
-        vel = adu.compute_vel([f.ego for f in scene.frames])
-        for i in range(len(vel)):
-            scene.frames[i].ego.velocity = vel[i]
-        session.commit()
+            agent_id = add_row(
+                Agent.__table__,
+                sample_token=sample_annotation_token,
+                category_name=category_name,
+                x=box.center[0],
+                y=box.center[1],
+                z=box.center[2],
+                qw=box.orientation[0],
+                qx=box.orientation[1],
+                qy=box.orientation[2],
+                qz=box.orientation[3],
+                width=box.wlh[0],
+                length=box.wlh[1],
+                height=box.wlh[2],
+                vx=0 if math.isnan(box.velocity[0]) else box.velocity[0],
+                vy=0 if math.isnan(box.velocity[1]) else box.velocity[1],
+                vz=0 if math.isnan(box.velocity[2]) else box.velocity[2],
+                track_id=db_tracks[instance_token],
+                frame_id=frame_id,
+                visibility=Agent.visibilty_from_nuscenes(
+                    nusc.get("visibility", sample_annotation["visibility_token"])[
+                        "level"
+                    ]
+                ),
+            )
+
+            agent_xy.append((agent_id, box.center[0], box.center[1]))
+
+        cur_sample_token = sample["next"]
+        if cur_sample_token == last_sample_token:
+            break
+
+    # add maps
+    curr_map_index = map_index(map_name=map_name)
+    ego_map_layers = curr_map_index.layers_on_points(
+        [(x, y) for _, x, y in ego_xy], ["lane"]
+    )
+    for i, (ego_id, _, _) in enumerate(ego_xy):
+        if ego_map_layers["lane"][i] != "":
+            rows[ego_map_association_table.name].append(
+                dict(ego_id=ego_id, map_id=map_ids[ego_map_layers["lane"][i]])
+            )
+
+    map_layers = curr_map_index.layers_on_points([(x, y) for _, x, y in agent_xy])
+    for i, (agent_id, _, _) in enumerate(agent_xy):
+        for layer in MAP_LAYERS:
+            if map_layers[layer][i] != "":
+                rows[agent_map.name].append(
+                    dict(agent_id=agent_id, map_id=map_ids[map_layers[layer][i]])
+                )
+
+    return rows
+
+
+def write_scene_rows(conn, rows, next_id):
+    """
+    Shift the scene-local keys of `extract_scene_rows` to the next free ids and insert the rows.
+    :param conn: Connection with an open transaction.
+    :param rows: Rows of a single scene, keyed by table name.
+    :param next_id: Next free primary key per table name, advanced in place.
+    """
+    for table in BULK_TABLES:
+        if len(rows[table.name]) == 0:
+            continue
+
+        offsets = {
+            column.name: next_id[fk.column.table.name]
+            for column in table.columns
+            for fk in column.foreign_keys
+            if fk.column.table.name in next_id
+        }
+        if table.name in next_id:
+            offsets["id"] = next_id[table.name]
+
+        for row in rows[table.name]:
+            for column, offset in offsets.items():
+                row[column] += offset
+        conn.execute(insert(table), rows[table.name])
+
+    for table in BULK_ID_TABLES:
+        next_id[table.name] += len(rows[table.name])
+
+
+# state inherited by forked extraction workers
+_worker_args = None
+
+
+def _extract_scene_rows_worker(scene_token):
+    nusc, map_index, map_ids = _worker_args
+    return extract_scene_rows(nusc, map_index, map_ids, nusc.get("scene", scene_token))
+
+
+def bulk_scene_extractor(nusc, map_index, map_ids, scenes, engine, workers=1):
+    """
+    Same rows as `scene_extractor`, but built as plain dicts and written with
+    executemany inserts, one transaction per scene. Map layers are looked up with
+    `map_index(map_name=...)`, which should return a cached `MapLayerIndex`.
+    With `workers` > 1 the scenes are extracted in a process pool and written by this process.
+    """
+    global _worker_args
+
+    selected_scenes = [scene for scene in nusc.scene if scene["name"] in scenes]
+    scene_tokens = [scene["token"] for scene in selected_scenes]
+
+    with engine.connect() as conn:
+        next_id = {
+            table.name: (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+            for table in BULK_ID_TABLES
+        }
+
+    pool = None
+    if workers > 1:
+        # build the map indices up front, so the workers share them as well
+        for scene in selected_scenes:
+            map_index(map_name=nusc.get("log", scene["log_token"])["location"])
+
+        # fork so the workers share the loaded nuScenes tables instead of reloading them
+        _worker_args = (nusc, map_index, map_ids)
+        pool = multiprocessing.get_context("fork").Pool(workers)
+        # imap keeps the scene order, ids are the same as in a serial run
+        scene_rows = pool.imap(_extract_scene_rows_worker, scene_tokens)
+    else:
+        scene_rows = (
+            extract_scene_rows(nusc, map_index, map_ids, nusc.get("scene", token))
+            for token in scene_tokens
+        )
+
+    try:
+        for rows in tqdm(scene_rows, total=len(scene_tokens)):
+            with engine.begin() as conn:
+                write_scene_rows(conn, rows, next_id)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            _worker_args = None
+
+
+def compute_ego_vel(session, scene_ids=None):
+    """
+    Compute the ego velocities of the given scenes with a single read and a single executemany UPDATE.
+    By default only scenes with missing velocities, i.e. newly ingested ones, are processed.
+    """
+    if scene_ids is None:
+        scene_ids = select(Frame.scene_id).join(Frame.ego).where(Ego.velocity.is_(None))
+
+    stmt = (
+        select(Ego.id, Frame.scene_id, Frame.timestamp, Ego.x, Ego.y)
+        .join(Ego.frame)
+        .where(Frame.scene_id.in_(scene_ids))
+        .order_by(Frame.scene_id, Frame.id)
+    )
+    rows = session.execute(stmt).all()
+    if len(rows) == 0:
+        return
+
+    ego_ids, frame_scene_ids, ts, x, y = (np.array(c) for c in zip(*rows))
+    vel = adu.compute_vel_grouped(frame_scene_ids, ts, np.stack([x, y], axis=1))
+
+    session.execute(
+        update(Ego),
+        [dict(id=i, velocity=v) for i, v in zip(ego_ids.tolist(), vel.tolist())],
+    )
+    session.commit()
+
+
+def get_scene_names(split, scene_list=None):
+    if scene_list is not None:
+        names = [line.strip() for line in scene_list.read_text().splitlines()]
+        return {name for name in names if len(name) > 0}
+    if split == "trainval":
+        return set(splits.train) | set(splits.val)
+    return set(getattr(splits, split))
 
 
 def main():
@@ -258,31 +696,84 @@ def main():
         "--split",
         help="nuScenes data split",
         default="val",
-        choices=["val"],
+        choices=["train", "val", "trainval", "mini_train", "mini_val"],
+    )
+    parser.add_argument(
+        "--scene_list",
+        help="file with one scene name per line, overrides --split",
+        type=Path,
     )
     parser.add_argument(
         "--db_path",
         type=Path,
         default="nuScenes.db",
     )
+    parser.add_argument(
+        "--bulk",
+        help="build rows in memory and write them with executemany inserts",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--incremental",
+        help="keep an existing database and only ingest scenes it does not contain yet",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers",
+        help="number of processes extracting scenes in parallel (requires --bulk)",
+        default=1,
+        type=int,
+    )
     args = parser.parse_args()
+    if args.workers > 1 and not args.bulk:
+        parser.error("--workers requires --bulk")
 
     nusc = NuScenes(
         version=f"v1.0-{args.version}", dataroot=args.dataroot, verbose=False
     )
-    nusc_map = partial(NuScenesMap, dataroot=args.dataroot)
-    scenes = getattr(splits, args.split)
+    # every location is parsed once, forked workers inherit the loaded maps
+    nusc_map = lru_cache(maxsize=None)(partial(NuScenesMap, dataroot=args.dataroot))
+    scenes = get_scene_names(args.split, args.scene_list)
 
-    # Warning: existing db will be removed
-    args.db_path.unlink(missing_ok=True)
+    if not args.incremental:
+        # Warning: existing db will be removed
+        args.db_path.unlink(missing_ok=True)
 
     engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
     Base.metadata.create_all(engine)
     session = Session(engine)
 
-    map_extractor(nusc_map, session)
-    scene_extractor(nusc, nusc_map, scenes, session)
-    compute_ego_vel(session)
+    # scenes are committed as a whole, so every stored scene is fully ingested
+    ingested = set(session.scalars(select(Scene.scene_token)).all())
+    scenes = {
+        scene["name"]
+        for scene in nusc.scene
+        if scene["name"] in scenes and scene["token"] not in ingested
+    }
+    tqdm.write(
+        f"Ingesting {len(scenes)} scenes, {len(ingested)} already in the database"
+    )
+
+    if session.scalar(select(func.count(Map.id))) > 0:
+        map_ids = load_map_ids(session)
+    else:
+        map_ids = map_extractor(nusc_map, session)
+
+    # every location is indexed once, forked workers inherit the indices
+    map_index = lru_cache(maxsize=None)(partial(load_map_index, nusc_map))
+    if args.bulk:
+        # a resumed database must survive a crash during the build
+        synchronous = "NORMAL" if args.incremental else "OFF"
+        with sqlite_bulk_pragmas(engine, synchronous=synchronous):
+            bulk_scene_extractor(
+                nusc, map_index, map_ids, scenes, engine, workers=args.workers
+            )
+            compute_ego_vel(session)
+            compute_agent_geometry(session)
+    else:
+        scene_extractor(nusc, map_index, map_ids, scenes, session)
+        compute_ego_vel(session)
+        compute_agent_geometry(session)
 
 
 if __name__ == "__main__":
@@ -34,6 +34,8 @@ from prompt_toolkit.layout import (
 )
 
 from annotator.data.models import SensorType
+from annotator.data.loading import VERIFICATION
+from annotator.data.migrations import migrate
 from annotator.data.maneuvers import (
     PositiveManeuver,
     NegativeManeuver,
@@ -571,6 +573,7 @@ def init_viewer(args) -> None:
 def main(args):
     init_viewer(args)
     engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
     session = Session(engine)
     stmt = (
         select(Maneuver)
@@ -578,6 +581,7 @@ def main(args):
         .where(Maneuver.in_use == False)
         .outerjoin(PositiveManeuver)
         .order_by(PositiveManeuver.type)
+        .options(*VERIFICATION)
     )
     maneuvers = session.scalars(stmt).all()
     annotate(session, maneuvers, args)
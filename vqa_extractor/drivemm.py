@@ -8,6 +8,9 @@ from tqdm import tqdm
 
 from annotator.data.maneuvers import Maneuver
 from annotator.data.models import Frame, SensorType, VisibilityType
+from annotator.data.loading import VQA_EXTRACTION
+from annotator.data.migrations import migrate
+import annotator.data.utils as adu
 from annotator.data.maneuvers import Maneuver, PositiveManeuver, ManeuverType
 from vqa_extractor.base import VQAExtractor
 
@@ -115,13 +118,18 @@ def remove_our_existing_questions(out):
 
 def main(args):
     engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
     session = Session(engine)
 
-    stmt = select(Maneuver).where(
-        Maneuver.manually_labeled == True,
-        Maneuver.in_use == True,
-        Maneuver.pos_maneuvers != None,
-        Maneuver.pos_maneuvers.any(),
+    stmt = (
+        select(Maneuver)
+        .where(
+            Maneuver.manually_labeled == True,
+            Maneuver.in_use == True,
+            Maneuver.pos_maneuvers != None,
+            Maneuver.pos_maneuvers.any(),
+        )
+        .options(*VQA_EXTRACTION)
     )
     maneuvers = session.scalars(stmt).all()
 
@@ -139,15 +147,12 @@ def main(args):
     for man in tqdm(maneuvers):
         prompt, answer_text, answer_letter = extractor.generate_prompt_answers(man)
 
-        sensors = {}
         # add all sensor paths
-        for sensor_type in cam_order:
-            for frame in man.frames:
-                sensor = frame.get_sensor(sensor_type)
-                key = f"{sensor_type.name}"
-                if key not in sensors:
-                    sensors[key] = []
-                sensors[key].append(sensor.path)
+        paths = adu.get_sensor_arrays(man.frames, cam_order)["path"]
+        sensors = {
+            sensor_type.name: paths[:, i].tolist()
+            for i, sensor_type in enumerate(cam_order)
+        }
 
         qa = dict(
             images=sensors,
@@ -13,18 +13,26 @@ from annotator.mining.consts import short_maneuver_description
 from vqa_extractor.base import VQAExtractor
 from annotator.data.maneuvers import Maneuver
 from annotator.data.models import Frame, SensorType, VisibilityType
+from annotator.data.loading import VQA_EXTRACTION
+from annotator.data.migrations import migrate
+import annotator.data.utils as adu
 from annotator.data.maneuvers import Maneuver, PositiveManeuver, ManeuverType
 
 
 def main(args):
     engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
     session = Session(engine)
 
-    stmt = select(Maneuver).where(
-        Maneuver.manually_labeled == True,
-        Maneuver.in_use == True,
-        Maneuver.pos_maneuvers != None,
-        Maneuver.pos_maneuvers.any(),
+    stmt = (
+        select(Maneuver)
+        .where(
+            Maneuver.manually_labeled == True,
+            Maneuver.in_use == True,
+            Maneuver.pos_maneuvers != None,
+            Maneuver.pos_maneuvers.any(),
+        )
+        .options(*VQA_EXTRACTION)
     )
     maneuvers = session.scalars(stmt).all()
 
@@ -40,16 +48,12 @@ def main(args):
             for n in man.neg_maneuvers
         ])
 
-        sensors = {}
         # add all sensor paths
-        for sensor_type in SensorType:
-            for frame in man.frames:
-                sensor = frame.get_sensor(sensor_type)
-                key = f"{sensor_type.name}"
-                if key not in sensors:
-                    sensors[key] = []
-                sensors[key].append(sensor.path)
-        man_data["sensors"] = sensors
+        paths = adu.get_sensor_arrays(man.frames)["path"]
+        man_data["sensors"] = {
+            sensor_type.name: paths[:, i].tolist()
+            for i, sensor_type in enumerate(SensorType)
+        }
 
         # add ego data
         if man.is_ego:
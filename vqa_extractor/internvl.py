@@ -10,6 +10,8 @@ from tqdm import tqdm
 
 from annotator.data.maneuvers import Maneuver
 from annotator.data.models import Frame, SensorType, VisibilityType
+from annotator.data.loading import VQA_EXTRACTION
+from annotator.data.migrations import migrate
 from annotator.data.maneuvers import Maneuver, PositiveManeuver, ManeuverType
 from vqa_extractor.base import VQAExtractor
 from vqa_extractor.senna import long_maneuver_description, short_maneuver_description
@@ -133,13 +135,18 @@ class VLMMultiImageVQAExtractor(VQAExtractor):
 
 def main(args):
     engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
     session = Session(engine)
 
-    stmt = select(Maneuver).where(
-        Maneuver.manually_labeled == True,
-        Maneuver.in_use == True,
-        Maneuver.pos_maneuvers != None,
-        Maneuver.pos_maneuvers.any(),
+    stmt = (
+        select(Maneuver)
+        .where(
+            Maneuver.manually_labeled == True,
+            Maneuver.in_use == True,
+            Maneuver.pos_maneuvers != None,
+            Maneuver.pos_maneuvers.any(),
+        )
+        .options(*VQA_EXTRACTION)
     )
     maneuvers = session.scalars(stmt).all()
 
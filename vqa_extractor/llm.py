@@ -11,6 +11,8 @@ from tqdm import tqdm
 from vqa_extractor.base import VQAExtractor
 from annotator.data.maneuvers import Maneuver
 from annotator.data.models import Frame, VisibilityType
+from annotator.data.loading import VQA_EXTRACTION
+from annotator.data.migrations import migrate
 from annotator.data.maneuvers import Maneuver, PositiveManeuver, ManeuverType
 
 
@@ -59,10 +61,10 @@ Which of the following options best describes agent 1 driving behaviour with res
         if man.is_ego and not man.is_other_agent:
             pos = [e for e in man.egos]
             xyzs = [
-                p.translate_rotate_xyz(-np.array(pos[0].xyz), pos[0].q.inverse)
+                p.translate_rotate_xyz(-np.array(pos[0].xyz), pos[0].q_inverse)
                 for p in pos
             ]
-            rots = [p.rotate_yaw(pos[0].q.inverse) for p in pos]
+            rots = [p.rotate_yaw(pos[0].q_inverse) for p in pos]
 
             ego_data = ""
             for i, (xyz, rot) in enumerate(zip(xyzs, rots)):
@@ -77,10 +79,10 @@ Which of the following options best describes agent 1 driving behaviour with res
         if man.is_ego and man.is_other_agent:
             pos = [e for e in man.egos]
             xyzs = [
-                p.translate_rotate_xyz(-np.array(pos[0].xyz), pos[0].q.inverse)
+                p.translate_rotate_xyz(-np.array(pos[0].xyz), pos[0].q_inverse)
                 for p in pos
             ]
-            rots = [p.rotate_yaw(pos[0].q.inverse) for p in pos]
+            rots = [p.rotate_yaw(pos[0].q_inverse) for p in pos]
 
             ego_data = ""
             for i, (xyz, rot) in enumerate(zip(xyzs, rots)):
@@ -106,10 +108,10 @@ Which of the following options best describes agent 1 driving behaviour with res
         if man.is_agent and not man.is_other_agent:
             pos = [e for e in man.egos]
             xyzs = [
-                p.translate_rotate_xyz(-np.array(pos[0].xyz), pos[0].q.inverse)
+                p.translate_rotate_xyz(-np.array(pos[0].xyz), pos[0].q_inverse)
                 for p in pos
             ]
-            rots = [p.rotate_yaw(pos[0].q.inverse) for p in pos]
+            rots = [p.rotate_yaw(pos[0].q_inverse) for p in pos]
 
             ego_data = ""
             for i, (xyz, rot) in enumerate(zip(xyzs, rots)):
@@ -133,10 +135,10 @@ Which of the following options best describes agent 1 driving behaviour with res
         if man.is_agent and man.is_other_agent:
             pos = [e for e in man.egos]
             xyzs = [
-                p.translate_rotate_xyz(-np.array(pos[0].xyz), pos[0].q.inverse)
+                p.translate_rotate_xyz(-np.array(pos[0].xyz), pos[0].q_inverse)
                 for p in pos
             ]
-            rots = [p.rotate_yaw(pos[0].q.inverse) for p in pos]
+            rots = [p.rotate_yaw(pos[0].q_inverse) for p in pos]
 
             ego_data = ""
             for i, (xyz, rot) in enumerate(zip(xyzs, rots)):
@@ -173,13 +175,18 @@ Which of the following options best describes agent 1 driving behaviour with res
 
 def main(args):
     engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
     session = Session(engine)
 
-    stmt = select(Maneuver).where(
-        Maneuver.manually_labeled == True,
-        Maneuver.in_use == True,
-        Maneuver.pos_maneuvers != None,
-        Maneuver.pos_maneuvers.any(),
+    stmt = (
+        select(Maneuver)
+        .where(
+            Maneuver.manually_labeled == True,
+            Maneuver.in_use == True,
+            Maneuver.pos_maneuvers != None,
+            Maneuver.pos_maneuvers.any(),
+        )
+        .options(*VQA_EXTRACTION)
     )
     maneuvers = session.scalars(stmt).all()
 
@@ -13,6 +13,8 @@ from tqdm import tqdm
 
 from annotator.data.maneuvers import Maneuver, ego_maneuvers
 from annotator.data.models import Frame, SensorType, VisibilityType
+from annotator.data.loading import VQA_EXTRACTION
+from annotator.data.migrations import migrate
 from annotator.data.maneuvers import Maneuver, PositiveManeuver, ManeuverType
 from vqa_extractor.base import VQAExtractor
 
@@ -555,13 +557,18 @@ class SennaVQAExtractor(VQAExtractor):
 
 def main(args):
     engine = create_engine(f"sqlite:///{str(args.db_path.name)}", echo=False)
+    migrate(engine)
     session = Session(engine)
 
-    stmt = select(Maneuver).where(
-        Maneuver.manually_labeled == True,
-        Maneuver.in_use == True,
-        Maneuver.pos_maneuvers != None,
-        Maneuver.pos_maneuvers.any(),
+    stmt = (
+        select(Maneuver)
+        .where(
+            Maneuver.manually_labeled == True,
+            Maneuver.in_use == True,
+            Maneuver.pos_maneuvers != None,
+            Maneuver.pos_maneuvers.any(),
+        )
+        .options(*VQA_EXTRACTION)
     )
     maneuvers = session.scalars(stmt).all()
 